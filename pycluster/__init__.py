@@ -8,6 +8,8 @@ __author__ = "PyCluster Team"
 from .core.host import Host
 from .core.worker import Worker
 from .decorators import remote, set_host
-from .config import Config
+from .config import Config, configure_logging
+
+configure_logging()
 
 __all__ = ["Host", "Worker", "remote", "set_host", "Config"] 
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Result cache backends for the remote decorator
+"""
+
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+import cloudpickle
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Returned by get() on a cache miss, since None is a valid cached result
+MISSING = object()
+
+class MemoryCache:
+    """In-process cache that evicts the oldest entries first
+    
+    Safe to use from several threads, as sync remote calls run in executors.
+    """
+    
+    # Whether get/set do I/O and should be kept off the event loop
+    blocking = False
+    
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._results: Dict[bytes, Any] = {}
+    
+    def get(self, key: bytes) -> Any:
+        """Get a cached result, or MISSING"""
+        with self._lock:
+            return self._results.get(key, MISSING)
+    
+    def set(self, key: bytes, result: Any) -> None:
+        """Store a result, keeping the first one stored for a key"""
+        with self._lock:
+            if key in self._results:
+                return
+            self._results[key] = result
+            # Dicts keep insertion order, so the first key is the oldest
+            if len(self._results) > self.maxsize:
+                del self._results[next(iter(self._results))]
+    
+    def clear(self) -> None:
+        """Drop all cached results"""
+        with self._lock:
+            self._results.clear()
+
+class SQLiteCache:
+    """Cache in an SQLite database, shareable by processes on one filesystem
+    
+    Entries are namespaced per function; the oldest ones are evicted first
+    once a namespace holds more than maxsize results.
+    """
+    
+    blocking = True
+    
+    def __init__(self, path: str, namespace: str, maxsize: int = 1024):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "namespace TEXT, key BLOB, value BLOB, ts REAL, PRIMARY KEY (namespace, key))"
+        )
+    
+    def get(self, key: bytes) -> Any:
+        """Get a cached result, or MISSING"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM results WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        return MISSING if row is None else pickle.loads(row[0])
+    
+    def set(self, key: bytes, result: Any) -> None:
+        """Store a result, keeping the first one stored for a key"""
+        value = cloudpickle.dumps(result)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)", (self.namespace, key, value, time.time())
+            )
+            self._connection.execute(
+                "DELETE FROM results WHERE namespace = ? AND key IN ("
+                "SELECT key FROM results WHERE namespace = ? ORDER BY ts DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.maxsize)
+            )
+    
+    def clear(self) -> None:
+        """Drop all cached results of this namespace"""
+        with self._lock:
+            self._connection.execute("DELETE FROM results WHERE namespace = ?", (self.namespace,))
+
+class RedisCache:
+    """Cache in a Redis server, shared by every host that uses it
+    
+    Eviction is left to the server's maxmemory policy and the optional ttl.
+    """
+    
+    blocking = True
+    
+    def __init__(self, url: str, namespace: str, ttl: Optional[int] = None):
+        if redis is None:
+            raise ImportError("The redis cache backend requires the redis package (pip install pycluster[redis])")
+        
+        self.prefix = f"pycluster:{namespace}:"
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+    
+    def get(self, key: bytes) -> Any:
+        """Get a cached result, or MISSING"""
+        value = self._client.get(self.prefix + key.hex())
+        return MISSING if value is None else pickle.loads(value)
+    
+    def set(self, key: bytes, result: Any) -> None:
+        """Store a result, keeping the first one stored for a key"""
+        self._client.set(self.prefix + key.hex(), cloudpickle.dumps(result), nx=True, ex=self.ttl)
+    
+    def clear(self) -> None:
+        """Drop all cached results of this namespace"""
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+def create_cache(backend: Optional[str], namespace: str, maxsize: Optional[int] = None, ttl: Optional[int] = None) -> Any:
+    """Create a cache from a backend spec: None/"memory", "sqlite:///path" or "redis://..."
+    
+    maxsize bounds the memory and SQLite backends (1024 entries by default);
+    ttl, in seconds, only applies to Redis, which evicts by its own policy.
+    """
+    if backend is not None and backend.startswith(("redis://", "rediss://", "unix://")):
+        if maxsize is not None:
+            raise ValueError("maxsize is not supported by the redis cache backend; use ttl or the server's maxmemory policy")
+        return RedisCache(backend, namespace, ttl)
+    
+    if ttl is not None:
+        raise ValueError("ttl is only supported by the redis cache backend")
+    if maxsize is None:
+        maxsize = 1024
+    if backend is None or backend == "memory":
+        return MemoryCache(maxsize)
+    if backend.startswith("sqlite:///"):
+        return SQLiteCache(backend[len("sqlite:///"):], namespace, maxsize)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -5,7 +5,6 @@ Command-line interface for PyCluster
 import asyncio
 import argparse
 import sys
-import socket
 import os
 import json
 from typing import Optional
@@ -13,20 +12,26 @@ from .core.host import Host
 from .core.worker import Worker
 from .decorators import set_host
 from .network import EncryptionManager
+from .utils.helpers import get_hostname, install_uvloop
 
 def save_encryption_key(key: bytes, key_file: str):
     """Save encryption key to file"""
-    key_data = {
-        "encryption_key": key.hex()
-    }
-    with open(key_file, 'w') as f:
-        json.dump(key_data, f)
+    with open(key_file, 'wb') as f:
+        f.write(key)
 
 def load_encryption_key(key_file: str) -> bytes:
     """Load encryption key from file"""
-    with open(key_file, 'r') as f:
-        key_data = json.load(f)
-    return bytes.fromhex(key_data["encryption_key"])
+    with open(key_file, 'rb') as f:
+        key_data = f.read()
+    
+    # Key files used to be JSON with a hex-encoded key. A raw key may also
+    # start with '{', so only treat the file as JSON if it parses as such.
+    if key_data[:1] == b'{':
+        try:
+            return bytes.fromhex(json.loads(key_data)["encryption_key"])
+        except (ValueError, KeyError, TypeError):
+            pass
+    return key_data
 
 async def start_host(args):
     """Start the host dispatcher"""
@@ -89,16 +94,6 @@ async def list_workers(args):
     print("Worker listing functionality requires connection to host")
     print("This feature will be implemented in a future version")
 
-def get_local_ip():
-    """Get the local IP address"""
-    try:
-        # Connect to a remote address to determine local IP
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.connect(("8.8.8.8", 80))
-            return s.getsockname()[0]
-    except:
-        return "127.0.0.1"
-
 def main():
     """Main CLI entry point"""
     parser = argparse.ArgumentParser(
@@ -125,7 +120,7 @@ Examples:
     join_parser.add_argument("--host", required=True, help="Host IP address")
     join_parser.add_argument("--port", type=int, default=8888, help="Host port (default: 8888)")
     join_parser.add_argument("--key", required=True, help="One-time password from host")
-    join_parser.add_argument("--worker-id", default=socket.gethostname(), help="Worker ID (default: hostname)")
+    join_parser.add_argument("--worker-id", default=get_hostname(), help="Worker ID (default: hostname)")
     join_parser.add_argument("--key-file", default="pycluster.key", help="File to load encryption key from (default: pycluster.key)")
     
     # List command
@@ -137,6 +132,8 @@ Examples:
         parser.print_help()
         return
     
+    install_uvloop()
+    
     try:
         if args.command == "host":
             asyncio.run(start_host(args))
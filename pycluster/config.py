@@ -2,6 +2,8 @@
 Configuration settings for PyCluster
 """
 
+import logging
+import logging.config
 import os
 from dataclasses import dataclass
 from typing import Optional
@@ -16,12 +18,14 @@ class Config:
     HOST_ADDRESS: str = "0.0.0.0"
     
     # Security settings
-    KEY_SIZE: int = 32  # bytes for Fernet key
+    KEY_SIZE: int = 32  # bytes for the AES-256-GCM key
+    ALLOW_LOOPBACK_PLAINTEXT: bool = False  # skip message encryption when both peers are on loopback
     OTP_LENGTH: int = 8  # characters for one-time password
     
     # File transfer settings
     CHUNK_SIZE: int = 8192  # bytes per chunk
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB max file size
+    COMPRESSION_THRESHOLD: int = 4096  # frames larger than this are LZ4-compressed when available
     
     # Timeout settings
     CONNECTION_TIMEOUT: float = 30.0  # seconds
@@ -34,8 +38,12 @@ class Config:
     
     # Worker settings
     MAX_WORKERS: int = 10
+    MAX_CONCURRENT_TASKS: int = 8  # tasks a worker runs at once
     WORKER_IDLE_TIMEOUT: float = 300.0  # seconds
     
+    # Event loop settings
+    DISABLE_UVLOOP: bool = False  # use the default asyncio loop even if uvloop is installed
+    
     @classmethod
     def from_env(cls) -> "Config":
         """Create config from environment variables"""
@@ -45,15 +53,32 @@ class Config:
             HOST_ADDRESS=os.getenv("PYCLUSTER_HOST_ADDRESS", cls.HOST_ADDRESS),
             KEY_SIZE=int(os.getenv("PYCLUSTER_KEY_SIZE", cls.KEY_SIZE)),
             OTP_LENGTH=int(os.getenv("PYCLUSTER_OTP_LENGTH", cls.OTP_LENGTH)),
+            ALLOW_LOOPBACK_PLAINTEXT=os.getenv("PYCLUSTER_ALLOW_LOOPBACK_PLAINTEXT", "0").lower() in ("1", "true", "yes"),
             CHUNK_SIZE=int(os.getenv("PYCLUSTER_CHUNK_SIZE", cls.CHUNK_SIZE)),
             MAX_FILE_SIZE=int(os.getenv("PYCLUSTER_MAX_FILE_SIZE", cls.MAX_FILE_SIZE)),
+            COMPRESSION_THRESHOLD=int(os.getenv("PYCLUSTER_COMPRESSION_THRESHOLD", cls.COMPRESSION_THRESHOLD)),
             CONNECTION_TIMEOUT=float(os.getenv("PYCLUSTER_CONNECTION_TIMEOUT", cls.CONNECTION_TIMEOUT)),
             TASK_TIMEOUT=float(os.getenv("PYCLUSTER_TASK_TIMEOUT", cls.TASK_TIMEOUT)),
             HEARTBEAT_INTERVAL=float(os.getenv("PYCLUSTER_HEARTBEAT_INTERVAL", cls.HEARTBEAT_INTERVAL)),
             LOG_LEVEL=os.getenv("PYCLUSTER_LOG_LEVEL", cls.LOG_LEVEL),
             MAX_WORKERS=int(os.getenv("PYCLUSTER_MAX_WORKERS", cls.MAX_WORKERS)),
+            MAX_CONCURRENT_TASKS=int(os.getenv("PYCLUSTER_MAX_CONCURRENT_TASKS", cls.MAX_CONCURRENT_TASKS)),
             WORKER_IDLE_TIMEOUT=float(os.getenv("PYCLUSTER_WORKER_IDLE_TIMEOUT", cls.WORKER_IDLE_TIMEOUT)),
+            DISABLE_UVLOOP=os.getenv("PYCLUSTER_DISABLE_UVLOOP", "0").lower() in ("1", "true", "yes"),
         )
 
 # Global config instance
-config = Config.from_env() 
\ No newline at end of file
+config = Config.from_env() 
+
+def configure_logging() -> None:
+    """Give the package logger its default handler, unless one is already set up"""
+    if logging.getLogger("pycluster").handlers:
+        return
+    
+    logging.config.dictConfig({
+        "version": 1,
+        "disable_existing_loggers": False,
+        "formatters": {"default": {"format": config.LOG_FORMAT}},
+        "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "default"}},
+        "loggers": {"pycluster": {"level": config.LOG_LEVEL, "handlers": ["console"]}},
+    })
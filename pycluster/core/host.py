@@ -3,24 +3,186 @@ Host/dispatcher system for PyCluster
 """
 
 import asyncio
+import heapq
+import hmac
+import itertools
 import logging
+import pickle
+import secrets
 import socket
+import sys
 import cloudpickle
 import time
-from typing import Dict, List, Optional, Any, Callable
-from dataclasses import dataclass
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Container, Dict, List, Optional, Any, Callable, Set, Tuple, cast
+from dataclasses import dataclass, field
 from ..network import SocketManager, EncryptionManager
+from ..network.compression import LZ4_AVAILABLE
+from ..network.socket_manager import STREAM_LIMIT
+from ..network.messages import (
+    Auth, AuthResponse, Disconnect, ExecuteTask, Heartbeat, HeartbeatAck, TaskResult
+)
 from ..config import config
+from ..utils.helpers import OFFLOAD_THRESHOLD, estimate_size
 
-@dataclass
+_log = logging.getLogger("pycluster.host")
+
+# Slotted dataclasses need Python 3.10
+_DATACLASS_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_SLOTS)
 class WorkerInfo:
     """Information about a connected worker"""
     id: str
     hostname: str
-    socket_manager: SocketManager
     last_heartbeat: float
     is_active: bool = True
-    current_task: Optional[str] = None
+    # IDs of tasks in flight, and how many the worker runs at once
+    tasks: Set[str] = field(default_factory=set)
+    capacity: int = 1
+    is_queued: bool = False
+    pending_heartbeat_acks: int = 0
+
+class ConnectionPool:
+    """Pool of authenticated worker connections keyed by worker ID"""
+    
+    def __init__(self, max_connections: int = config.MAX_WORKERS):
+        """Initialize an empty pool"""
+        self.max_connections = max_connections
+        self._idle: Dict[str, asyncio.Queue] = {}
+        self._last_used: Dict[str, Dict[SocketManager, float]] = {}
+    
+    def __len__(self) -> int:
+        return sum(len(connections) for connections in self._last_used.values())
+    
+    def add(self, worker_id: str, socket_manager: SocketManager) -> bool:
+        """Add an authenticated connection, returning False if the pool is full"""
+        if len(self) >= self.max_connections:
+            return False
+        
+        if worker_id not in self._idle:
+            self._idle[worker_id] = asyncio.Queue()
+            self._last_used[worker_id] = {}
+        self._last_used[worker_id][socket_manager] = time.time()
+        self._idle[worker_id].put_nowait(socket_manager)
+        return True
+    
+    def discard(self, worker_id: str, socket_manager: SocketManager) -> None:
+        """Remove a connection from the pool"""
+        connections = self._last_used.get(worker_id)
+        if connections is None:
+            return
+        
+        connections.pop(socket_manager, None)
+        if not connections:
+            del self._last_used[worker_id]
+            del self._idle[worker_id]
+    
+    def close_worker(self, worker_id: str) -> int:
+        """Remove and close every connection to a worker, returning how many there were"""
+        connections = list(self._last_used.get(worker_id, ()))
+        for socket_manager in connections:
+            self.discard(worker_id, socket_manager)
+            socket_manager.close()
+        return len(connections)
+    
+    def has_connections(self, worker_id: str) -> bool:
+        """Check whether a worker has any pooled connections"""
+        return worker_id in self._last_used
+    
+    @asynccontextmanager
+    async def acquire(self, worker_id: str, timeout: float = config.CONNECTION_TIMEOUT) -> AsyncIterator[SocketManager]:
+        """Check out an idle connection to a worker, returning it to the pool on exit"""
+        queue = self._idle.get(worker_id)
+        if queue is None:
+            raise RuntimeError(f"No connections to worker {worker_id}")
+        
+        while True:
+            try:
+                socket_manager = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"No idle connection to worker {worker_id} within {timeout} seconds")
+            # Skip connections discarded while they were queued
+            if socket_manager in self._last_used.get(worker_id, {}):
+                break
+        
+        try:
+            yield socket_manager
+        finally:
+            self.release(worker_id, socket_manager)
+    
+    def release(self, worker_id: str, socket_manager: SocketManager) -> None:
+        """Return a checked-out connection to the pool"""
+        connections = self._last_used.get(worker_id)
+        if connections is None or socket_manager not in connections:
+            return
+        
+        connections[socket_manager] = time.time()
+        self._idle[worker_id].put_nowait(socket_manager)
+    
+    def reap_idle(self, idle_timeout: float, active_workers: Container[str]) -> int:
+        """Close connections idle for longer than idle_timeout
+        
+        One connection is kept per active worker; workers not in
+        active_workers lose all of theirs, so their slots are freed.
+        """
+        cutoff = time.time() - idle_timeout
+        reaped = 0
+        
+        for worker_id, connections in list(self._last_used.items()):
+            if worker_id not in active_workers:
+                reaped += self.close_worker(worker_id)
+                continue
+            
+            # Most recently used first, so the warmest connection is kept
+            ordered = sorted(connections.items(), key=lambda item: item[1], reverse=True)
+            for socket_manager, last_used in ordered[1:]:
+                if last_used < cutoff:
+                    self.discard(worker_id, socket_manager)
+                    socket_manager.close()
+                    reaped += 1
+        
+        return reaped
+
+class PreparedTask:
+    """A function bound to a host with its serialized form computed once
+    
+    Calling it only pickles the arguments; the cloudpickled function frame
+    is reused for every dispatch.
+    """
+    
+    __slots__ = ("host", "func", "serialized_func")
+    
+    def __init__(self, host: "Host", func: Callable, serialized_func: bytes):
+        self.host = host
+        self.func = func
+        self.serialized_func = serialized_func
+    
+    async def __call__(self, args: tuple = (), kwargs: Optional[dict] = None, task_id: Optional[str] = None, target_worker: Optional[str] = None) -> Any:
+        """Execute the function on a worker"""
+        if task_id is None:
+            task_id = f"{getattr(self.func, '__name__', 'task')}_{secrets.token_hex(4)}"
+        return await self.host._execute_serialized(task_id, self.serialized_func, args, kwargs or {}, target_worker)
+    
+    def run_sync(self, args: tuple = (), kwargs: Optional[dict] = None, task_id: Optional[str] = None, target_worker: Optional[str] = None) -> Any:
+        """Execute the function from another thread, blocking until it finishes
+        
+        The task is scheduled on the host's own event loop, which must be
+        running in a different thread than the caller.
+        """
+        loop = self.host._loop
+        if loop is None or loop.is_closed():
+            raise RuntimeError("Host is not running")
+        
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            raise RuntimeError("Cannot block on a remote call from the host's event loop; await it instead")
+        
+        return asyncio.run_coroutine_threadsafe(self(args, kwargs, task_id, target_worker), loop).result()
 
 class Host:
     """Central dispatcher that manages workers and distributes tasks"""
@@ -30,241 +192,390 @@ class Host:
         self.port = port or config.DEFAULT_HOST_PORT
         self.encryption_manager = EncryptionManager(encryption_key)
         self.workers: Dict[str, WorkerInfo] = {}
+        self.pool = ConnectionPool(config.MAX_WORKERS)
+        self._task_results: Dict[str, asyncio.Future] = {}
+        # Serving loop and ready queue of idle workers, both set in start()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle_workers: Optional["asyncio.Queue[WorkerInfo]"] = None
+        # Heartbeat deadlines as (deadline, worker_id, version); entries whose
+        # version no longer matches _heartbeat_version are stale and skipped
+        self._heartbeat_heap: List[Tuple[float, str, int]] = []
+        self._heartbeat_version: Dict[str, int] = {}
+        self._heartbeat_seq = itertools.count()
         self.server: Optional[asyncio.Server] = None
         self.is_running = False
         self.otp = EncryptionManager.generate_otp(config.OTP_LENGTH)
         
-        # Setup logging
-        self.logger = logging.getLogger("pycluster.host")
-        self.logger.setLevel(config.LOG_LEVEL)
-        
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(config.LOG_FORMAT)
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
+        # Pickled functions, reused across dispatches of the same callable
+        self._func_cache: "weakref.WeakKeyDictionary[Callable, bytes]" = weakref.WeakKeyDictionary()
     
     async def start(self) -> None:
         """Start the host server"""
+        self._loop = asyncio.get_running_loop()
+        self._idle_workers = asyncio.Queue()
+        _log.info("Event loop: %s.%s", type(self._loop).__module__, type(self._loop).__name__)
+        
         self.server = await asyncio.start_server(
             self._handle_worker_connection,
             config.HOST_ADDRESS,
-            self.port
+            self.port,
+            limit=STREAM_LIMIT
         )
         
         self.is_running = True
-        self.logger.info(f"Host started on {config.HOST_ADDRESS}:{self.port}")
-        self.logger.info(f"One-time password: {self.otp}")
+        _log.info("Host started on %s:%s", config.HOST_ADDRESS, self.port)
+        _log.info("One-time password: %s", self.otp)
         
-        # Start heartbeat monitoring
+        # Start heartbeat monitoring and idle connection reaping
         asyncio.create_task(self._heartbeat_monitor())
+        asyncio.create_task(self._connection_reaper())
         
         async with self.server:
             await self.server.serve_forever()
     
     async def _handle_worker_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
         """Handle incoming worker connections"""
+        worker_id: Optional[str] = None
         try:
             # Create socket manager for this connection
-            socket_manager = SocketManager(self.encryption_manager)
-            socket_manager.reader = reader
-            socket_manager.writer = writer
+            socket_manager = SocketManager(self.encryption_manager, config.ALLOW_LOOPBACK_PLAINTEXT)
+            socket_manager.attach(reader, writer)
             
-            self.logger.info("Worker attempting to connect...")
+            _log.info("Worker attempting to connect...")
             
             # Wait for authentication
             try:
                 auth_msg = await socket_manager.receive_message()
-                self.logger.info(f"Received auth message: {auth_msg}")
+                _log.info("Received auth message: %s", auth_msg)
                 
-                if auth_msg["type"] != "auth":
-                    raise ValueError(f"Expected authentication message, got {auth_msg['type']}")
+                if not isinstance(auth_msg, Auth):
+                    raise ValueError(f"Expected authentication message, got {type(auth_msg).__name__}")
                 
-                otp = auth_msg.get("otp")
-                worker_id = auth_msg.get("worker_id")
-                hostname = auth_msg.get("hostname", "unknown")
+                otp = auth_msg.otp
+                expected_otp = self.otp
+                worker_id = auth_msg.worker_id
+                hostname = auth_msg.hostname
                 
-                self.logger.info(f"Worker {worker_id} ({hostname}) attempting auth with OTP: {otp}")
+                _log.info("Worker %s (%s) attempting auth with OTP: %s", worker_id, hostname, otp)
                 
-                if otp != self.otp:
-                    self.logger.warning(f"Invalid OTP from {worker_id}: {otp} != {self.otp}")
-                    await socket_manager.send_message({
-                        "type": "auth_response",
-                        "success": False,
-                        "message": "Invalid OTP"
-                    })
+                if not hmac.compare_digest(otp.encode(), expected_otp.encode()):
+                    _log.warning("Invalid OTP from %s", worker_id)
+                    await socket_manager.send_message(AuthResponse(
+                        success=False,
+                        message="Invalid OTP"
+                    ))
                     return
                 
-                # Accept worker
-                await socket_manager.send_message({
-                    "type": "auth_response",
-                    "success": True,
-                    "message": "Authentication successful",
-                    "encryption_key": self.encryption_manager.get_key().hex()
-                })
+                if not self.pool.add(worker_id, socket_manager):
+                    _log.warning("Rejecting %s: connection limit of %s reached", worker_id, self.pool.max_connections)
+                    await socket_manager.send_message(AuthResponse(
+                        success=False,
+                        message="Connection limit reached"
+                    ))
+                    return
                 
-                # Register worker
-                worker_info = WorkerInfo(
-                    id=worker_id,
-                    hostname=hostname,
-                    socket_manager=socket_manager,
-                    last_heartbeat=time.time()
-                )
-                self.workers[worker_id] = worker_info
+                # Accept worker, then switch to the session key derived from the nonce
+                nonce = secrets.token_bytes(16)
+                loopback_plaintext = auth_msg.loopback_plaintext and socket_manager.can_skip_encryption()
+                await socket_manager.send_message(AuthResponse(
+                    success=True,
+                    message="Authentication successful",
+                    nonce=nonce,
+                    lz4=LZ4_AVAILABLE,
+                    loopback_plaintext=loopback_plaintext
+                ))
+                socket_manager.encryption_manager = self.encryption_manager.derive_session(otp, nonce, worker_id)
+                socket_manager.compress = LZ4_AVAILABLE and auth_msg.lz4
+                socket_manager.plaintext = loopback_plaintext
+                
+                # Register worker, or attach another connection to a known one
+                worker_info = self.workers.get(worker_id)
+                if worker_info is None:
+                    worker_info = WorkerInfo(
+                        id=worker_id,
+                        hostname=hostname,
+                        last_heartbeat=time.time()
+                    )
+                    self.workers[worker_id] = worker_info
+                    self._schedule_heartbeat_deadline(worker_info)
+                    asyncio.create_task(self._heartbeat_ack_flusher(worker_info))
+                worker_info.capacity = max(auth_msg.max_tasks, 1)
                 
-                self.logger.info(f"Worker connected: {worker_id} ({hostname})")
+                self._mark_idle(worker_info)
+                
+                _log.info("Worker connected: %s (%s)", worker_id, hostname)
                 
                 # Handle worker messages
-                await self._handle_worker_messages(worker_info)
+                await self._handle_worker_messages(worker_info, socket_manager)
                 
             except Exception as auth_error:
-                self.logger.error(f"Authentication error: {auth_error}")
+                _log.error("Authentication error: %s", auth_error)
                 # Try to send error response
                 try:
-                    await socket_manager.send_message({
-                        "type": "auth_response",
-                        "success": False,
-                        "message": f"Authentication failed: {auth_error}"
-                    })
+                    await socket_manager.send_message(AuthResponse(
+                        success=False,
+                        message=f"Authentication failed: {auth_error}"
+                    ))
                 except:
                     pass
                 raise
             
         except Exception as e:
-            self.logger.error(f"Error handling worker connection: {e}")
+            _log.error("Error handling worker connection: %s", e)
             import traceback
-            self.logger.error(f"Traceback: {traceback.format_exc()}")
+            _log.error("Traceback: %s", traceback.format_exc())
         finally:
+            # Covers failures between pooling the connection and handling
+            # its messages; discarding twice is harmless
+            if worker_id is not None:
+                self.pool.discard(worker_id, socket_manager)
             writer.close()
             await writer.wait_closed()
     
-    async def _handle_worker_messages(self, worker_info: WorkerInfo) -> None:
-        """Handle messages from a specific worker"""
+    async def _handle_worker_messages(self, worker_info: WorkerInfo, socket_manager: SocketManager) -> None:
+        """Handle messages from one connection of a specific worker"""
         try:
-            while worker_info.is_active:
-                message = await worker_info.socket_manager.receive_message()
+            # Every message that arrived in one read is dispatched without
+            # yielding to the loop. Heartbeats are only counted here; their
+            # acks are sent in bulk by _heartbeat_ack_flusher or on the next task.
+            async for messages in socket_manager.receive_messages_batch():
+                heartbeats = 0
                 
-                if message["type"] == "heartbeat":
-                    worker_info.last_heartbeat = time.time()
-                    await worker_info.socket_manager.send_message({
-                        "type": "heartbeat_response"
-                    })
-                
-                elif message["type"] == "task_result":
-                    # Handle task completion
-                    task_id = message["task_id"]
-                    result = message["result"]
-                    success = message["success"]
+                for message in messages:
+                    # Decoded messages are always exact Struct types, so an
+                    # identity check on the type replaces isinstance()
+                    kind = type(message)
+                    if kind is Heartbeat:
+                        heartbeats += 1
                     
-                    if success:
-                        self.logger.info(f"Task {task_id} completed successfully on {worker_info.id}")
-                        # Set the result in the future
-                        if hasattr(self, '_task_results') and task_id in self._task_results:
-                            future = self._task_results[task_id]
-                            if not future.done():
-                                future.set_result(result)
-                    else:
-                        self.logger.error(f"Task {task_id} failed on {worker_info.id}: {result}")
-                        # Set the exception in the future
-                        if hasattr(self, '_task_results') and task_id in self._task_results:
-                            future = self._task_results[task_id]
-                            if not future.done():
-                                future.set_exception(RuntimeError(f"Task failed: {result}"))
+                    elif kind is TaskResult:
+                        self._handle_task_result(worker_info, cast(TaskResult, message))
                     
-                    worker_info.current_task = None
+                    elif kind is Disconnect:
+                        return
+                
+                if heartbeats:
+                    worker_info.last_heartbeat = time.time()
+                    worker_info.pending_heartbeat_acks += heartbeats
+                    self._schedule_heartbeat_deadline(worker_info)
                 
-                elif message["type"] == "disconnect":
+                if not worker_info.is_active:
                     break
                     
         except Exception as e:
-            self.logger.error(f"Error handling messages from {worker_info.id}: {e}")
+            _log.error("Error handling messages from %s: %s", worker_info.id, e)
         finally:
-            # Remove worker
-            if worker_info.id in self.workers:
+            # Remove worker once its last connection is gone
+            self.pool.discard(worker_info.id, socket_manager)
+            if not self.pool.has_connections(worker_info.id) and worker_info.id in self.workers:
+                worker_info.is_active = False
                 del self.workers[worker_info.id]
-                self.logger.info(f"Worker disconnected: {worker_info.id}")
+                self._heartbeat_version.pop(worker_info.id, None)
+                _log.info("Worker disconnected: %s", worker_info.id)
+    
+    def _handle_task_result(self, worker_info: WorkerInfo, message: TaskResult) -> None:
+        """Resolve the future of a completed task"""
+        task_id = message.task_id
+        future = self._task_results.get(task_id)
+        
+        if message.success:
+            _log.info("Task %s completed successfully on %s", task_id, worker_info.id)
+            if future is not None and not future.done():
+                # Unpickle the result; out-of-band buffers are wrapped in
+                # bytearrays so arrays rebuilt from them stay writable
+                serialized_result, *buffer_frames = message.frames
+                try:
+                    result = pickle.loads(
+                        serialized_result,
+                        buffers=[bytearray(frame) for frame in buffer_frames]
+                    )
+                except Exception as e:
+                    future.set_exception(RuntimeError(f"Could not deserialize result of task {task_id}: {e}"))
+                else:
+                    future.set_result(result)
+        else:
+            _log.error("Task %s failed on %s: %s", task_id, worker_info.id, message.error)
+            if future is not None and not future.done():
+                future.set_exception(RuntimeError(f"Task failed: {message.error}"))
+        
+        worker_info.tasks.discard(task_id)
+        self._mark_idle(worker_info)
+    
+    def _schedule_heartbeat_deadline(self, worker_info: WorkerInfo) -> None:
+        """Push a new expiry deadline for a worker, superseding any earlier one"""
+        version = next(self._heartbeat_seq)
+        self._heartbeat_version[worker_info.id] = version
+        deadline = worker_info.last_heartbeat + config.HEARTBEAT_INTERVAL * 2
+        heapq.heappush(self._heartbeat_heap, (deadline, worker_info.id, version))
     
     async def _heartbeat_monitor(self) -> None:
         """Monitor worker heartbeats and mark inactive workers"""
+        heap = self._heartbeat_heap
+        
         while self.is_running:
-            current_time = time.time()
-            inactive_workers = []
+            now = time.time()
             
-            for worker_id, worker_info in self.workers.items():
-                if current_time - worker_info.last_heartbeat > config.HEARTBEAT_INTERVAL * 2:
+            # Only expired deadlines are popped; superseded ones are dropped
+            while heap and heap[0][0] <= now:
+                _, worker_id, version = heapq.heappop(heap)
+                if self._heartbeat_version.get(worker_id) != version:
+                    continue
+                
+                del self._heartbeat_version[worker_id]
+                worker_info = self.workers.pop(worker_id, None)
+                if worker_info is not None:
                     worker_info.is_active = False
-                    inactive_workers.append(worker_id)
+                    _log.warning("Worker %s marked as inactive", worker_id)
+                # Free the silent worker's pool slots
+                self.pool.close_worker(worker_id)
+            
+            # Sleep until the next deadline, waking at least once per interval
+            delay = heap[0][0] - now if heap else config.HEARTBEAT_INTERVAL
+            await asyncio.sleep(min(delay, config.HEARTBEAT_INTERVAL))
+    
+    async def _heartbeat_ack_flusher(self, worker_info: WorkerInfo) -> None:
+        """Acknowledge a worker's pending heartbeats in one message per half interval"""
+        interval = config.HEARTBEAT_INTERVAL / 2
+        
+        while self.is_running and worker_info.is_active:
+            await asyncio.sleep(interval)
+            
+            pending = worker_info.pending_heartbeat_acks
+            if not pending:
+                continue
             
-            for worker_id in inactive_workers:
-                if worker_id in self.workers:
-                    del self.workers[worker_id]
-                    self.logger.warning(f"Worker {worker_id} marked as inactive")
+            worker_info.pending_heartbeat_acks = 0
+            try:
+                async with self.pool.acquire(worker_info.id) as socket_manager:
+                    await socket_manager.send_message(HeartbeatAck(n=pending))
+            except Exception as e:
+                _log.debug("Stopped acknowledging heartbeats for %s: %s", worker_info.id, e)
+                return
+    
+    async def _connection_reaper(self) -> None:
+        """Close pooled connections that have been idle for too long"""
+        while self.is_running:
+            reaped = self.pool.reap_idle(config.WORKER_IDLE_TIMEOUT, self.workers)
+            if reaped:
+                _log.info("Closed %s idle worker connection(s)", reaped)
             
             await asyncio.sleep(config.HEARTBEAT_INTERVAL)
     
+    def prepare(self, func: Callable) -> PreparedTask:
+        """Serialize a function once for repeated execution on this host"""
+        return PreparedTask(self, func, self._serialize_func(func))
+    
     async def execute_task(self, task_id: str, func: Callable, args: tuple, kwargs: dict, target_worker: Optional[str] = None) -> Any:
         """Execute a task on a worker"""
+        return await self._execute_serialized(task_id, self._serialize_func(func), args, kwargs, target_worker)
+    
+    async def _execute_serialized(self, task_id: str, serialized_func: bytes, args: tuple, kwargs: dict, target_worker: Optional[str] = None) -> Any:
+        """Execute a task whose function has already been serialized"""
         # Find available worker
         if target_worker:
             if target_worker not in self.workers:
                 raise ValueError(f"Target worker {target_worker} not found")
             worker_info = self.workers[target_worker]
         else:
-            # Find worker with no current task
-            available_workers = [w for w in self.workers.values() if w.current_task is None and w.is_active]
-            if not available_workers:
-                raise RuntimeError("No available workers")
-            worker_info = available_workers[0]
+            worker_info = await self._next_idle_worker()
         
         # Create a future to wait for the result
-        result_future = asyncio.Future()
+        loop = asyncio.get_running_loop()
+        result_future = loop.create_future()
         
         # Store the future for this task
-        if not hasattr(self, '_task_results'):
-            self._task_results = {}
         self._task_results[task_id] = result_future
+        worker_info.tasks.add(task_id)
+        # Keep the worker on the ready queue while it has free slots
+        self._mark_idle(worker_info)
         
-        # Serialize function and arguments
-        serialized_func = cloudpickle.dumps(func)
-        serialized_args = cloudpickle.dumps(args)
-        serialized_kwargs = cloudpickle.dumps(kwargs)
-        
-        # Send task to worker
-        worker_info.current_task = task_id
-        await worker_info.socket_manager.send_message({
-            "type": "execute_task",
-            "task_id": task_id,
-            "func": serialized_func,
-            "args": serialized_args,
-            "kwargs": serialized_kwargs
-        })
-        
-        self.logger.info(f"Task {task_id} sent to worker {worker_info.id}")
-        
-        # Wait for result with timeout
         try:
-            result = await asyncio.wait_for(result_future, timeout=config.TASK_TIMEOUT)
-            return result
+            # Serialize arguments, off the event loop for large payloads so
+            # other workers' messages keep being serviced
+            if estimate_size(args, kwargs) > OFFLOAD_THRESHOLD:
+                serialized = await loop.run_in_executor(None, _serialize_arguments, args, kwargs)
+            else:
+                serialized = _serialize_arguments(args, kwargs)
+            serialized_arguments, buffers = serialized
+            
+            # Send task to worker, with the function, arguments and out-of-band
+            # buffers as raw frames after the envelope
+            async with self.pool.acquire(worker_info.id) as socket_manager:
+                heartbeat_acks, worker_info.pending_heartbeat_acks = worker_info.pending_heartbeat_acks, 0
+                await socket_manager.send_message(
+                    ExecuteTask(task_id=task_id, heartbeat_acks=heartbeat_acks),
+                    [serialized_func, serialized_arguments, *(b.raw() for b in buffers)]
+                )
+            
+            _log.info("Task %s sent to worker %s", task_id, worker_info.id)
+            
+            # Wait for result with timeout
+            return await asyncio.wait_for(result_future, timeout=config.TASK_TIMEOUT)
         except asyncio.TimeoutError:
             raise RuntimeError(f"Task {task_id} timed out after {config.TASK_TIMEOUT} seconds")
         finally:
-            # Clean up
-            if task_id in self._task_results:
-                del self._task_results[task_id]
-            worker_info.current_task = None
+            # Clean up; a received result has already freed the slot, so
+            # this only matters when the task failed to send or timed out
+            self._task_results.pop(task_id, None)
+            if task_id in worker_info.tasks:
+                worker_info.tasks.discard(task_id)
+                self._mark_idle(worker_info)
+    
+    async def _next_idle_worker(self) -> WorkerInfo:
+        """Wait for a worker with a free task slot from the ready queue"""
+        if self._idle_workers is None:
+            raise RuntimeError("Host is not running")
+        
+        deadline = time.monotonic() + config.CONNECTION_TIMEOUT
+        while True:
+            try:
+                worker_info = await asyncio.wait_for(
+                    self._idle_workers.get(),
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                raise RuntimeError("No available workers")
+            
+            worker_info.is_queued = False
+            # Skip workers that disconnected or were filled by targeted tasks while queued
+            if worker_info.is_active and len(worker_info.tasks) < worker_info.capacity:
+                return worker_info
+    
+    def _mark_idle(self, worker_info: WorkerInfo) -> None:
+        """Put a worker on the ready queue if it has a free slot and is not already queued"""
+        if self._idle_workers is None or worker_info.is_queued:
+            return
+        if worker_info.is_active and len(worker_info.tasks) < worker_info.capacity:
+            worker_info.is_queued = True
+            self._idle_workers.put_nowait(worker_info)
+    
+    def _serialize_func(self, func: Callable) -> bytes:
+        """Serialize a function with cloudpickle, caching the result per callable"""
+        try:
+            serialized_func = self._func_cache.get(func)
+        except TypeError:
+            # Not weak-referenceable (e.g. builtins), so it can't be cached
+            uncached: bytes = cloudpickle.dumps(func)
+            return uncached
+        
+        if serialized_func is None:
+            serialized_func = cloudpickle.dumps(func)
+            self._func_cache[func] = serialized_func
+        return serialized_func
     
     def get_workers_info(self) -> List[Dict[str, Any]]:
         """Get information about all connected workers"""
-        workers_info = []
-        for worker_id, worker_info in self.workers.items():
-            workers_info.append({
+        return [
+            {
                 "id": worker_id,
                 "hostname": worker_info.hostname,
                 "is_active": worker_info.is_active,
-                "current_task": worker_info.current_task,
+                "current_tasks": sorted(worker_info.tasks),
+                "capacity": worker_info.capacity,
                 "last_heartbeat": worker_info.last_heartbeat
-            })
-        return workers_info
+            }
+            for worker_id, worker_info in self.workers.items()
+        ]
     
     def get_otp(self) -> str:
         """Get the current one-time password"""
@@ -273,7 +584,7 @@ class Host:
     def generate_new_otp(self) -> str:
         """Generate a new one-time password"""
         self.otp = EncryptionManager.generate_otp(config.OTP_LENGTH)
-        self.logger.info(f"New OTP generated: {self.otp}")
+        _log.info("New OTP generated: %s", self.otp)
         return self.otp
     
     async def stop(self) -> None:
@@ -282,4 +593,16 @@ class Host:
         if self.server:
             self.server.close()
             await self.server.wait_closed()
-        self.logger.info("Host stopped") 
\ No newline at end of file
+        _log.info("Host stopped")
+
+def _serialize_arguments(args: tuple, kwargs: dict) -> Tuple[bytes, List[pickle.PickleBuffer]]:
+    """Serialize a task's arguments
+    
+    The (args, kwargs) pair is one cloudpickle using protocol 5, so lambdas
+    and closures still work as arguments while large buffers (NumPy arrays,
+    PickleBuffer-wrapped bytes) are handed back out-of-band and sent as
+    their own frames instead of being copied into the stream.
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    serialized_arguments = cloudpickle.dumps((args, kwargs), protocol=5, buffer_callback=buffers.append)
+    return serialized_arguments, buffers
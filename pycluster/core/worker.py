@@ -3,14 +3,72 @@ Worker system for PyCluster
 """
 
 import asyncio
+import functools
 import logging
-import socket
+import pickle
 import cloudpickle
 import time
 import os
-from typing import Optional, Any, Callable
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Any, Callable, List, Set, Tuple, cast
 from ..network import SocketManager, EncryptionManager
+from ..network.compression import LZ4_AVAILABLE
+from ..network.messages import (
+    Auth, AuthResponse, Disconnect, ExecuteTask, Heartbeat, HeartbeatAck, TaskResult
+)
 from ..config import config
+from ..utils.helpers import OFFLOAD_THRESHOLD, estimate_size, get_hostname
+
+# Numba dispatchers keyed by their pickled form, so their compiled code is
+# reused across tasks; plain functions are unpickled afresh for every task
+_JIT_CACHE_SIZE = 16
+_jit_functions: "OrderedDict[bytes, Callable]" = OrderedDict()
+_jit_functions_lock = threading.Lock()
+
+def _is_jit_dispatcher(func: Any) -> bool:
+    """Check for a Numba dispatcher without importing numba"""
+    numba = sys.modules.get("numba")
+    return numba is not None and isinstance(func, numba.core.dispatcher.Dispatcher)
+
+def _load_function(serialized_func: bytes) -> Tuple[Callable, bool]:
+    """Deserialize a task function, reusing JIT-compiled dispatchers across tasks
+    
+    Returns the function and whether it is a coroutine function.
+    """
+    with _jit_functions_lock:
+        func = _jit_functions.get(serialized_func)
+        if func is not None:
+            _jit_functions.move_to_end(serialized_func)
+            return func, False
+    
+    func = cloudpickle.loads(serialized_func)
+    if _is_jit_dispatcher(func):
+        with _jit_functions_lock:
+            _jit_functions[serialized_func] = func
+            if len(_jit_functions) > _JIT_CACHE_SIZE:
+                _jit_functions.popitem(last=False)
+    return func, asyncio.iscoroutinefunction(func)
+
+def _deserialize_task(serialized_func: bytes, serialized_arguments: bytes, buffer_frames: List[bytes]) -> Tuple[Callable, bool, tuple, dict]:
+    """Deserialize a task's function and arguments
+    
+    Out-of-band buffers are wrapped in bytearrays so arrays rebuilt from
+    them stay writable.
+    """
+    func, is_coroutine = _load_function(serialized_func)
+    args, kwargs = pickle.loads(
+        serialized_arguments,
+        buffers=[bytearray(frame) for frame in buffer_frames]
+    )
+    return func, is_coroutine, args, kwargs
+
+def _serialize_result(result: Any) -> List[Any]:
+    """Pickle a task result into frames, with large buffers out-of-band"""
+    buffers: List[pickle.PickleBuffer] = []
+    serialized_result = cloudpickle.dumps(result, protocol=5, buffer_callback=buffers.append)
+    return [serialized_result, *(b.raw() for b in buffers)]
 
 class Worker:
     """Worker that connects to host and executes tasks"""
@@ -22,49 +80,63 @@ class Worker:
         self.port = port
         self.otp = otp
         self.encryption_manager = EncryptionManager(encryption_key)
-        self.socket_manager = SocketManager(self.encryption_manager)
+        self.socket_manager = SocketManager(self.encryption_manager, config.ALLOW_LOOPBACK_PLAINTEXT)
         self.is_connected = False
         self.is_running = False
-        self.hostname = socket.gethostname()
+        self.hostname = get_hostname()
         
-        # Setup logging
-        self.logger = logging.getLogger(f"pycluster.worker.{worker_id}")
-        self.logger.setLevel(config.LOG_LEVEL)
+        # Set when the connection drops or stop() is called; created in start()
+        # so it binds to the running loop on Python < 3.10
+        self._stop_event: Optional[asyncio.Event] = None
+        
+        # Bounds the tasks running at once, as advertised to the host; the
+        # semaphore is created in connect()
+        self._max_tasks = max(1, config.MAX_CONCURRENT_TASKS)
+        self._task_slots: Optional[asyncio.Semaphore] = None
+        self._running_tasks: Set[asyncio.Task] = set()
         
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(config.LOG_FORMAT)
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
+        self.logger = logging.getLogger(f"pycluster.worker.{worker_id}")
     
     async def connect(self) -> bool:
         """Connect to the host"""
+        if self._task_slots is None:
+            self._task_slots = asyncio.Semaphore(self._max_tasks)
+        
         try:
             await self.socket_manager.connect(self.host, self.port)
             
             # Send authentication
-            await self.socket_manager.send_message({
-                "type": "auth",
-                "otp": self.otp,
-                "worker_id": self.worker_id,
-                "hostname": self.hostname
-            })
+            await self.socket_manager.send_message(Auth(
+                otp=self.otp,
+                worker_id=self.worker_id,
+                hostname=self.hostname,
+                lz4=LZ4_AVAILABLE,
+                loopback_plaintext=self.socket_manager.can_skip_encryption(),
+                max_tasks=self._max_tasks
+            ))
             
             # Wait for authentication response
             auth_response = await self.socket_manager.receive_message()
-            if not auth_response.get("success"):
-                self.logger.error(f"Authentication failed: {auth_response.get('message')}")
+            if not isinstance(auth_response, AuthResponse):
+                self.logger.error("Expected authentication response, got %s", type(auth_response).__name__)
+                return False
+            if not auth_response.success:
+                self.logger.error("Authentication failed: %s", auth_response.message)
                 return False
             
-            # Update encryption key if provided by host
-            if "encryption_key" in auth_response:
-                host_key = bytes.fromhex(auth_response["encryption_key"])
-                self.encryption_manager = EncryptionManager(host_key)
-                self.socket_manager.encryption_manager = self.encryption_manager
-                self.logger.info("Updated encryption key from host")
+            # Switch to the session key derived from the host's nonce
+            if auth_response.nonce is None:
+                self.logger.error("Authentication response carried no session nonce")
+                return False
+            self.socket_manager.encryption_manager = self.encryption_manager.derive_session(
+                self.otp, auth_response.nonce, self.worker_id
+            )
+            
+            self.socket_manager.compress = LZ4_AVAILABLE and auth_response.lz4
+            self.socket_manager.plaintext = auth_response.loopback_plaintext and self.socket_manager.can_skip_encryption()
             
             self.is_connected = True
-            self.logger.info(f"Connected to host {self.host}:{self.port}")
+            self.logger.info("Connected to host %s:%s", self.host, self.port)
             
             # Start heartbeat and message handling
             asyncio.create_task(self._heartbeat_loop())
@@ -73,119 +145,139 @@ class Worker:
             return True
             
         except Exception as e:
-            self.logger.error(f"Failed to connect to host: {e}")
+            self.logger.error("Failed to connect to host: %s", e)
             return False
     
     async def _heartbeat_loop(self) -> None:
         """Send periodic heartbeats to host"""
         while self.is_connected and self.is_running:
             try:
-                await self.socket_manager.send_message({
-                    "type": "heartbeat",
-                    "worker_id": self.worker_id
-                })
+                await self.socket_manager.send_message(Heartbeat(worker_id=self.worker_id))
                 await asyncio.sleep(config.HEARTBEAT_INTERVAL)
             except Exception as e:
-                self.logger.error(f"Heartbeat failed: {e}")
+                self.logger.error("Heartbeat failed: %s", e)
                 break
         
-        self.is_connected = False
+        self._disconnected()
     
     async def _message_handler(self) -> None:
         """Handle messages from host"""
+        # Created by connect(), which always runs before the handler
+        task_slots = self._task_slots
+        assert task_slots is not None
+        
         try:
             while self.is_connected and self.is_running:
                 message = await self.socket_manager.receive_message()
+                kind = type(message)
                 
-                if message["type"] == "execute_task":
-                    await self._execute_task(message)
+                if kind is ExecuteTask:
+                    # Run tasks concurrently, waiting for a free slot first
+                    await task_slots.acquire()
+                    task = asyncio.create_task(self._run_task(cast(ExecuteTask, message), task_slots))
+                    self._running_tasks.add(task)
+                    task.add_done_callback(self._running_tasks.discard)
                 
-                elif message["type"] == "heartbeat_response":
-                    # Heartbeat acknowledged
+                elif kind is HeartbeatAck:
+                    # Heartbeats acknowledged (also piggybacked on ExecuteTask)
                     pass
                 
-                elif message["type"] == "disconnect":
+                elif kind is Disconnect:
                     break
                     
         except Exception as e:
-            self.logger.error(f"Error handling messages: {e}")
+            self.logger.error("Error handling messages: %s", e)
         finally:
-            self.is_connected = False
+            self._disconnected()
     
-    async def _execute_task(self, message: dict) -> None:
+    def _disconnected(self) -> None:
+        """Mark the worker disconnected and wake start()"""
+        self.is_connected = False
+        if self._stop_event is not None:
+            self._stop_event.set()
+    
+    async def _run_task(self, message: ExecuteTask, task_slots: asyncio.Semaphore) -> None:
+        """Execute a task, then free its slot"""
+        try:
+            await self._execute_task(message)
+        finally:
+            task_slots.release()
+    
+    async def _execute_task(self, message: ExecuteTask) -> None:
         """Execute a task received from host"""
-        task_id = message["task_id"]
-        serialized_func = message["func"]
-        serialized_args = message["args"]
-        serialized_kwargs = message["kwargs"]
+        task_id = message.task_id
+        serialized_func, serialized_arguments, *buffer_frames = message.frames
+        
+        loop = asyncio.get_running_loop()
         
         try:
-            # Deserialize function and arguments
-            func = cloudpickle.loads(serialized_func)
-            args = cloudpickle.loads(serialized_args)
-            kwargs = cloudpickle.loads(serialized_kwargs)
+            # Deserialize function and arguments, off the event loop for large
+            # payloads so heartbeats keep flowing
+            if sum(map(len, message.frames)) > OFFLOAD_THRESHOLD:
+                task = await loop.run_in_executor(None, _deserialize_task, serialized_func, serialized_arguments, buffer_frames)
+            else:
+                task = _deserialize_task(serialized_func, serialized_arguments, buffer_frames)
+            func, is_coroutine, args, kwargs = task
             
-            self.logger.info(f"Executing task {task_id}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Executing task %s", task_id)
             
             # Execute the function
-            if asyncio.iscoroutinefunction(func):
+            if is_coroutine:
                 result = await func(*args, **kwargs)
             else:
                 # Run in thread pool for blocking functions
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(None, func, *args, **kwargs)
+                result = await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
             
-            # Send result back to host
-            await self.socket_manager.send_message({
-                "type": "task_result",
-                "task_id": task_id,
-                "result": result,
-                "success": True
-            })
+            # Send result back to host, pickling large results off the event loop
+            if estimate_size((result,), {}) > OFFLOAD_THRESHOLD:
+                frames = await loop.run_in_executor(None, _serialize_result, result)
+            else:
+                frames = _serialize_result(result)
+            await self.socket_manager.send_message(TaskResult(task_id=task_id, success=True), frames)
             
-            self.logger.info(f"Task {task_id} completed successfully")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Task %s completed successfully", task_id)
             
         except Exception as e:
-            self.logger.error(f"Task {task_id} failed: {e}")
+            self.logger.error("Task %s failed: %s", task_id, e)
             
             # Send error back to host
-            await self.socket_manager.send_message({
-                "type": "task_result",
-                "task_id": task_id,
-                "result": str(e),
-                "success": False
-            })
+            await self.socket_manager.send_message(TaskResult(
+                task_id=task_id,
+                success=False,
+                error=str(e)
+            ))
     
     async def start(self) -> None:
         """Start the worker"""
         self.is_running = True
+        self._stop_event = asyncio.Event()
         
         if not await self.connect():
             raise ConnectionError("Failed to connect to host")
         
-        self.logger.info(f"Worker {self.worker_id} started")
+        self.logger.info("Worker %s started", self.worker_id)
         
-        # Keep running until disconnected
-        while self.is_connected and self.is_running:
-            await asyncio.sleep(1)
+        # Keep running until disconnected or stopped
+        await self._stop_event.wait()
     
     async def stop(self) -> None:
         """Stop the worker"""
         self.is_running = False
+        if self._stop_event is not None:
+            self._stop_event.set()
         
         if self.is_connected:
             try:
-                await self.socket_manager.send_message({
-                    "type": "disconnect",
-                    "worker_id": self.worker_id
-                })
+                await self.socket_manager.send_message(Disconnect(worker_id=self.worker_id))
             except:
                 pass
             
             self.socket_manager.close()
             await self.socket_manager.wait_closed()
         
-        self.logger.info(f"Worker {self.worker_id} stopped")
+        self.logger.info("Worker %s stopped", self.worker_id)
     
     def get_status(self) -> dict:
         """Get worker status"""
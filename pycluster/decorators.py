@@ -3,14 +3,28 @@ Decorators for PyCluster remote execution
 """
 
 import functools
-import uuid
+import hashlib
+import inspect
+import secrets
 import asyncio
-from typing import Optional, Callable, Any
-from .core.host import Host
+import warnings
+from typing import Dict, Optional, Callable, Any
+import cloudpickle
+from .cache import MISSING, create_cache
+from .core.host import Host, PreparedTask
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 # Global host instance (will be set when host starts)
 _host_instance: Optional[Host] = None
 
+# JIT-compiled functions keyed by a hash of their source and signature
+_jit_cache: Dict[str, Callable] = {}
+
 def set_host(host: Host) -> None:
     """Set the global host instance for remote execution"""
     global _host_instance
@@ -20,44 +34,137 @@ def get_host() -> Optional[Host]:
     """Get the global host instance"""
     return _host_instance
 
-def remote(computer: Optional[str] = None):
+def _jit_compile(func: Callable, signature: Optional[str] = None) -> Callable:
+    """Compile a function with numba.njit, reusing dispatchers built from identical source"""
+    if not NUMBA_AVAILABLE:
+        warnings.warn(f"numba is not installed; {func.__name__} will run without JIT", RuntimeWarning)
+        return func
+    
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = None
+    
+    if source is None:
+        return numba.njit(signature, cache=True)(func)
+    
+    key = hashlib.sha256(f"{func.__qualname__}\0{signature}\0{source}".encode()).hexdigest()
+    compiled = _jit_cache.get(key)
+    if compiled is None:
+        compiled = numba.njit(signature, cache=True)(func)
+        _jit_cache[key] = compiled
+    return compiled
+
+def remote(
+    computer: Optional[str] = None,
+    jit: bool = False,
+    signature: Optional[str] = None,
+    cache: bool = False,
+    maxsize: Optional[int] = None,
+    cache_backend: Optional[str] = None,
+    cache_ttl: Optional[int] = None
+) -> Callable[[Callable], Callable]:
     """
     Decorator to mark a function for remote execution
     
     Args:
         computer: Optional worker ID to target specific worker
+        jit: Compile the function with numba.njit before shipping it to
+            workers (requires numba on host and workers; ignored with a
+            warning when numba is not installed)
+        signature: Optional numba signature for eager compilation, e.g. "int64(int64)"
+        cache: Reuse results of earlier calls with equal arguments instead of
+            dispatching again; only for pure functions. Clear with
+            ``func.cache_clear()``
+        maxsize: Maximum number of cached results for the memory and SQLite
+            backends (default 1024); the oldest entries are evicted first.
+            Not supported with Redis, which raises ValueError
+        cache_backend: Where cached results live: None or "memory" for this
+            process, "sqlite:///path" for a database shared by processes on
+            one filesystem, or "redis://..." for a Redis server shared by
+            several hosts (requires redis). Implies cache=True
+        cache_ttl: Seconds a cached result lives in Redis; without it entries
+            stay until the server's maxmemory policy evicts them. Only
+            supported by the redis backend
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        async def async_wrapper(*args, **kwargs) -> Any:
+        original = func
+        if jit:
+            if asyncio.iscoroutinefunction(func):
+                raise TypeError("jit=True is not supported for async functions")
+            func = _jit_compile(func, signature)
+        
+        # Prepared on first dispatch and reused until the global host changes
+        prepared: Optional[PreparedTask] = None
+        
+        def get_prepared() -> PreparedTask:
+            nonlocal prepared
             if _host_instance is None:
                 raise RuntimeError("No host instance available. Call set_host() first.")
             
-            task_id = f"{func.__name__}_{uuid.uuid4().hex[:8]}"
-            return await _host_instance.execute_task(task_id, func, args, kwargs, computer)
+            if prepared is None or prepared.host is not _host_instance:
+                prepared = _host_instance.prepare(func)
+            return prepared
         
-        @functools.wraps(func)
-        def sync_wrapper(*args, **kwargs) -> Any:
-            if _host_instance is None:
-                raise RuntimeError("No host instance available. Call set_host() first.")
+        # Results of earlier calls keyed by a digest of the pickled arguments
+        use_cache = cache or cache_backend is not None
+        results = create_cache(cache_backend, f"{func.__module__}.{func.__qualname__}", maxsize, cache_ttl) if use_cache else None
+        
+        def cache_key(args: tuple, kwargs: dict) -> Optional[bytes]:
+            if results is None:
+                return None
+            try:
+                payload = cloudpickle.dumps((func.__qualname__, args, kwargs))
+            except Exception:
+                # Arguments that can't be pickled are simply not cached
+                return None
+            return hashlib.blake2b(payload, digest_size=16).digest()
+        
+        def cache_get(key: Optional[bytes]) -> Any:
+            if key is None or results is None:
+                return MISSING
+            return results.get(key)
+        
+        def cache_put(key: Optional[bytes], result: Any) -> None:
+            if key is not None and results is not None:
+                results.set(key, result)
+        
+        async def run_cache_op(op: Callable, *op_args: Any) -> Any:
+            # Disk and network backends run in the executor so the event loop
+            # keeps serving heartbeats and dispatch meanwhile
+            if results is None or not results.blocking:
+                return op(*op_args)
+            return await asyncio.get_running_loop().run_in_executor(None, op, *op_args)
+        
+        @functools.wraps(original)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = cache_key(args, kwargs)
+            result = await run_cache_op(cache_get, key)
+            if result is not MISSING:
+                return result
             
-            task_id = f"{func.__name__}_{uuid.uuid4().hex[:8]}"
+            task = get_prepared()
+            task_id = f"{func.__name__}_{secrets.token_hex(4)}"
+            result = await task(args, kwargs, task_id, computer)
+            await run_cache_op(cache_put, key, result)
+            return result
+        
+        @functools.wraps(original)
+        def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = cache_key(args, kwargs)
+            result = cache_get(key)
+            if result is not MISSING:
+                return result
             
-            # Simple approach: just call the host's execute_task directly
-            # This avoids event loop issues
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(
-                    lambda: asyncio.run(
-                        _host_instance.execute_task(task_id, func, args, kwargs, computer)
-                    )
-                )
-                return future.result()
+            task = get_prepared()
+            task_id = f"{func.__name__}_{secrets.token_hex(4)}"
+            result = task.run_sync(args, kwargs, task_id, computer)
+            cache_put(key, result)
+            return result
         
         # Return async wrapper if function is async, sync wrapper otherwise
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        wrapper: Callable = async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
+        setattr(wrapper, "cache_clear", results.clear if results is not None else lambda: None)
+        return wrapper
     
     return decorator 
\ No newline at end of file
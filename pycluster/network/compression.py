@@ -0,0 +1,60 @@
+"""
+Optional LZ4 compression of message frames for PyCluster
+"""
+
+from typing import Tuple, Union
+from ..config import config
+
+try:
+    import lz4.block
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+# Per-frame flags carried in the message header
+FLAG_NONE = 0
+FLAG_LZ4 = 1
+
+# Anything exposing the buffer protocol that frames are built from
+Frame = Union[bytes, bytearray, memoryview]
+
+class CompressionStats:
+    """Running totals of bytes before and after compression"""
+
+    def __init__(self) -> None:
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def record(self, raw_size: int, compressed_size: int) -> None:
+        """Record one compressed frame"""
+        self.raw_bytes += raw_size
+        self.compressed_bytes += compressed_size
+
+    @property
+    def ratio(self) -> float:
+        """Compressed size as a fraction of the original size"""
+        return self.compressed_bytes / self.raw_bytes if self.raw_bytes else 1.0
+
+stats = CompressionStats()
+
+def compress_frame(data: Frame) -> Tuple[int, Frame]:
+    """Compress a frame if it is large enough to benefit, returning (flag, data)"""
+    if not LZ4_AVAILABLE or len(data) <= config.COMPRESSION_THRESHOLD:
+        return FLAG_NONE, data
+
+    compressed = lz4.block.compress(data)
+    if len(compressed) >= len(data):
+        # Incompressible payload, send it as-is
+        return FLAG_NONE, data
+
+    stats.record(len(data), len(compressed))
+    return FLAG_LZ4, compressed
+
+def decompress_frame(flag: int, data: Frame) -> Frame:
+    """Undo compress_frame() for a received frame"""
+    if flag & FLAG_LZ4:
+        if not LZ4_AVAILABLE:
+            raise RuntimeError("Received an LZ4-compressed frame but lz4 is not installed")
+        decompressed: bytes = lz4.block.decompress(data)
+        return decompressed
+    return data
@@ -3,22 +3,36 @@ Encryption utilities for PyCluster
 """
 
 import base64
+import os
 import secrets
 import string
-from typing import Optional
-from cryptography.fernet import Fernet
+from typing import List, Optional, Union
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+# AES-GCM nonce size; each ciphertext is the nonce followed by the sealed data
+_NONCE_SIZE = 12
+
+# Characters used in one-time passwords
+_OTP_ALPHABET = string.ascii_uppercase + string.digits
+
+# Length of the urlsafe-base64 Fernet keys used by earlier versions
+_LEGACY_KEY_SIZE = 44
+
 class EncryptionManager:
-    """Manages encryption and decryption of messages"""
+    """Manages encryption and decryption of messages with AES-256-GCM"""
     
     def __init__(self, key: Optional[bytes] = None):
         """Initialize encryption manager with optional key"""
         if key is None:
-            key = Fernet.generate_key()
+            key = AESGCM.generate_key(256)
+        elif len(key) == _LEGACY_KEY_SIZE:
+            # Fernet keys from older key files decode to 32 raw bytes
+            key = base64.urlsafe_b64decode(key)
         self.key = key
-        self.cipher = Fernet(key)
+        self.aead = AESGCM(key)
     
     @classmethod
     def from_password(cls, password: str, salt: Optional[bytes] = None) -> "EncryptionManager":
@@ -32,16 +46,32 @@ class EncryptionManager:
             salt=salt,
             iterations=100000,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return cls(key)
+        return cls(kdf.derive(password.encode()))
+    
+    def derive_session(self, otp: str, nonce: bytes, context: str) -> "EncryptionManager":
+        """Derive a per-connection encryption manager from this key and the OTP
+        
+        Both peers run the same HKDF over the shared key and OTP, salted with
+        the host's nonce and bound to the worker ID, so no key material has
+        to cross the wire.
+        """
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=nonce,
+            info=context.encode(),
+        )
+        return EncryptionManager(hkdf.derive(self.key + otp.encode()))
     
-    def encrypt(self, data: bytes) -> bytes:
+    def encrypt(self, data: Union[bytes, bytearray, memoryview]) -> bytes:
         """Encrypt data"""
-        return self.cipher.encrypt(data)
+        nonce = os.urandom(_NONCE_SIZE)
+        return nonce + self.aead.encrypt(nonce, data, None)
     
-    def decrypt(self, encrypted_data: bytes) -> bytes:
+    def decrypt(self, encrypted_data: Union[bytes, bytearray, memoryview]) -> bytes:
         """Decrypt data"""
-        return self.cipher.decrypt(encrypted_data)
+        view = memoryview(encrypted_data)
+        return self.aead.decrypt(view[:_NONCE_SIZE], view[_NONCE_SIZE:], None)
     
     def get_key(self) -> bytes:
         """Get the encryption key"""
@@ -50,10 +80,17 @@ class EncryptionManager:
     @staticmethod
     def generate_otp(length: int = 8) -> str:
         """Generate a one-time password"""
-        alphabet = string.ascii_uppercase + string.digits
-        return ''.join(secrets.choice(alphabet) for _ in range(length))
+        # Random bytes are drawn in batches; bytes at or above the largest
+        # multiple of the alphabet size are dropped so every character is
+        # equally likely
+        alphabet = _OTP_ALPHABET
+        limit = 256 - 256 % len(alphabet)
+        chars: List[str] = []
+        while len(chars) < length:
+            chars += [alphabet[b % len(alphabet)] for b in secrets.token_bytes(length) if b < limit]
+        return ''.join(chars[:length])
     
     @staticmethod
     def generate_key() -> bytes:
         """Generate a new encryption key"""
-        return Fernet.generate_key() 
\ No newline at end of file
+        return AESGCM.generate_key(256) 
\ No newline at end of file
@@ -6,7 +6,12 @@ import os
 import asyncio
 import aiofiles
 from typing import Optional, Callable
-from .socket_manager import SocketManager
+from .socket_manager import CHUNK_LENGTH, WRITE_HIGH_WATER, SocketManager
+from .messages import FileTransferStart, FileTransferEnd
+from ..utils.helpers import format_size
+
+# Bytes read, encrypted and sent per file chunk
+_CHUNK_SIZE = 256 * 1024
 
 class FileTransfer:
     """Handles file transfers with progress tracking"""
@@ -18,7 +23,7 @@ class FileTransfer:
     async def send_file_with_progress(
         self, 
         file_path: str, 
-        chunk_size: int = 8192,
+        chunk_size: int = _CHUNK_SIZE,
         progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> None:
         """Send a file with progress tracking"""
@@ -29,90 +34,113 @@ class FileTransfer:
         sent_bytes = 0
         
         # Send file info
-        await self.socket_manager.send_message({
-            "type": "file_transfer_start",
-            "filename": os.path.basename(file_path),
-            "size": file_size
-        })
+        plaintext = self.socket_manager.plaintext_files
+        await self.socket_manager.send_message(FileTransferStart(
+            filename=os.path.basename(file_path),
+            size=file_size,
+            plaintext=plaintext
+        ))
         
-        # Send file in chunks with progress
-        async with aiofiles.open(file_path, 'rb') as f:
-            while True:
-                chunk = await f.read(chunk_size)
-                if not chunk:
-                    break
-                
-                encrypted_chunk = self.socket_manager.encryption_manager.encrypt(chunk)
-                length = len(encrypted_chunk).to_bytes(4, 'big')
-                
-                self.socket_manager.writer.write(length + encrypted_chunk)
-                await self.socket_manager.writer.drain()
-                
-                sent_bytes += len(chunk)
-                if progress_callback:
-                    progress_callback(sent_bytes, file_size)
+        if plaintext:
+            await self._send_plaintext(file_path, file_size, chunk_size, progress_callback)
+            await self.socket_manager.send_message(FileTransferEnd())
+            return
+        
+        # Send file in chunks with progress. The next block is read while the
+        # current one is encrypted, and the writer is only drained once the
+        # transport buffer passes the high-water mark set by attach().
+        writer = self.socket_manager.writer
+        if writer is None:
+            raise ConnectionError("Not connected")
+        transport = writer.transport
+        encrypt = self.socket_manager.encryption_manager.encrypt
+        next_read: Optional["asyncio.Future[bytes]"] = None
+        
+        try:
+            async with aiofiles.open(file_path, 'rb') as f:
+                next_read = asyncio.ensure_future(f.read(chunk_size))
+                while True:
+                    chunk = await next_read
+                    if not chunk:
+                        break
+                    next_read = asyncio.ensure_future(f.read(chunk_size))
+                    
+                    encrypted_chunk = encrypt(chunk)
+                    writer.writelines((CHUNK_LENGTH.pack(len(encrypted_chunk)), encrypted_chunk))
+                    if transport.get_write_buffer_size() > WRITE_HIGH_WATER:
+                        await writer.drain()
+                    
+                    sent_bytes += len(chunk)
+                    if progress_callback:
+                        progress_callback(sent_bytes, file_size)
+        finally:
+            if next_read is not None:
+                next_read.cancel()
+        
+        await writer.drain()
         
         # Send end marker
-        await self.socket_manager.send_message({"type": "file_transfer_end"})
+        await self.socket_manager.send_message(FileTransferEnd())
+    
+    async def _send_plaintext(
+        self,
+        file_path: str,
+        file_size: int,
+        chunk_size: int,
+        progress_callback: Optional[Callable[[int, int], None]]
+    ) -> None:
+        """Send a file's bytes unencrypted with sendfile, one chunk per progress update"""
+        sent_bytes = 0
+        
+        with open(file_path, 'rb') as f:
+            while sent_bytes < file_size:
+                sent = await self.socket_manager.sendfile(f, sent_bytes, min(chunk_size, file_size - sent_bytes))
+                if not sent:
+                    raise EOFError(f"{file_path} shrank while it was being sent")
+                sent_bytes += sent
+                if progress_callback:
+                    progress_callback(sent_bytes, file_size)
     
     async def receive_file_with_progress(
         self, 
         save_path: str, 
-        chunk_size: int = 8192,
+        chunk_size: int = _CHUNK_SIZE,
         progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> None:
         """Receive a file with progress tracking"""
-        # Receive file info
-        file_info = await self.socket_manager.receive_message()
-        if file_info["type"] != "file_transfer_start":
-            raise ValueError("Expected file transfer start message")
-        
-        file_size = file_info["size"]
-        received_bytes = 0
-        
         # Ensure directory exists
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        
-        # Receive file in chunks with progress
-        async with aiofiles.open(save_path, 'wb') as f:
-            while received_bytes < file_size:
-                # Read chunk length
-                length_data = await self.socket_manager.reader.readexactly(4)
-                length = int.from_bytes(length_data, 'big')
-                
-                # Read encrypted chunk
-                encrypted_chunk = await self.socket_manager.reader.readexactly(length)
-                chunk = self.socket_manager.encryption_manager.decrypt(encrypted_chunk)
-                
-                await f.write(chunk)
-                received_bytes += len(chunk)
-                
-                if progress_callback:
-                    progress_callback(received_bytes, file_size)
+        directory = os.path.dirname(save_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         
-        # Receive end marker
-        end_msg = await self.socket_manager.receive_message()
-        if end_msg["type"] != "file_transfer_end":
-            raise ValueError("Expected file transfer end message")
+        await self.socket_manager.receive_file(save_path, chunk_size, progress_callback)
     
-    @staticmethod
-    def format_size(size_bytes: int) -> str:
-        """Format file size in human readable format"""
-        if size_bytes == 0:
-            return "0B"
-        
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        i = 0
-        while size_bytes >= 1024 and i < len(size_names) - 1:
-            size_bytes /= 1024.0
-            i += 1
-        
-        return f"{size_bytes:.1f}{size_names[i]}"
+    format_size = staticmethod(format_size)
     
     @staticmethod
     def default_progress_callback(sent: int, total: int) -> None:
         """Default progress callback that prints progress"""
         percentage = (sent / total) * 100 if total > 0 else 0
-        print(f"\rProgress: {percentage:.1f}% ({FileTransfer.format_size(sent)}/{FileTransfer.format_size(total)})", end="")
+        print(f"\rProgress: {percentage:.1f}% ({format_size(sent)}/{format_size(total)})", end="")
         if sent >= total:
-            print()  # New line when complete 
\ No newline at end of file
+            print()  # New line when complete
+    
+    @staticmethod
+    def progress_printer() -> Callable[[int, int], None]:
+        """Create a progress callback for one transfer that prints only when the shown percentage changes
+        
+        At most about a thousand lines are printed per transfer, whatever
+        the chunk size; use a new callback for every transfer.
+        """
+        last_shown = -1
+        
+        def callback(sent: int, total: int) -> None:
+            nonlocal last_shown
+            # Progress is shown with one decimal, i.e. in steps of 0.1%
+            shown = sent * 1000 // total if total > 0 else 1000
+            if shown == last_shown and sent < total:
+                return
+            last_shown = shown
+            FileTransfer.default_progress_callback(sent, total)
+        
+        return callback
@@ -0,0 +1,100 @@
+"""
+Wire message types for PyCluster
+"""
+
+from typing import List, Optional, Union
+import msgspec
+
+class Message(msgspec.Struct, tag_field="type"):
+    """Base class for messages exchanged between host and workers"""
+
+class Auth(Message, tag="auth"):
+    """Authentication request sent by a worker"""
+    otp: str
+    worker_id: str
+    hostname: str = "unknown"
+    lz4: bool = False
+    loopback_plaintext: bool = False
+    max_tasks: int = 1  # tasks the worker runs at once
+
+class AuthResponse(Message, tag="auth_response"):
+    """Host reply to an authentication request
+    
+    On success ``nonce`` salts the session key both peers derive with
+    EncryptionManager.derive_session().
+    """
+    success: bool
+    message: str = ""
+    nonce: Optional[bytes] = None
+    lz4: bool = False
+    loopback_plaintext: bool = False
+
+class Heartbeat(Message, tag="heartbeat"):
+    """Periodic liveness message sent by a worker"""
+    worker_id: str
+
+class HeartbeatAck(Message, tag="heartbeat_ack"):
+    """Host acknowledgement of the last n heartbeats"""
+    n: int = 1
+
+class ExecuteTask(Message, tag="execute_task", omit_defaults=True):
+    """Task dispatched to a worker
+
+    The pickled function, arguments and out-of-band buffers travel as raw
+    frames after the envelope; they are attached to ``frames`` on receipt.
+    """
+    task_id: str
+    heartbeat_acks: int = 0
+    frames: List[bytes] = []
+
+class TaskResult(Message, tag="task_result", omit_defaults=True):
+    """Outcome of a task, sent by the worker that ran it
+
+    On success the pickled return value and its out-of-band buffers travel
+    as raw frames after the envelope; on failure ``error`` describes it.
+    """
+    task_id: str
+    success: bool
+    error: str = ""
+    frames: List[bytes] = []
+
+class Disconnect(Message, tag="disconnect"):
+    """Notice that the sender is closing the connection"""
+    worker_id: str = ""
+
+class FileTransferStart(Message, tag="file_transfer_start"):
+    """Header sent before the chunks of a file
+
+    With ``plaintext`` set the file's bytes follow as-is instead of as
+    length-prefixed encrypted chunks.
+    """
+    filename: str
+    size: int
+    plaintext: bool = False
+
+class FileTransferEnd(Message, tag="file_transfer_end"):
+    """Marker sent after the last chunk of a file"""
+
+AnyMessage = Union[
+    Auth,
+    AuthResponse,
+    Heartbeat,
+    HeartbeatAck,
+    ExecuteTask,
+    TaskResult,
+    Disconnect,
+    FileTransferStart,
+    FileTransferEnd,
+]
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(AnyMessage)
+
+def encode(message: Message) -> bytes:
+    """Encode a message to msgpack"""
+    return _encoder.encode(message)
+
+def decode(data: Union[bytes, bytearray, memoryview]) -> Message:
+    """Decode a msgpack-encoded message"""
+    message: Message = _decoder.decode(data)
+    return message
@@ -3,90 +3,277 @@ Async socket communication manager for PyCluster
 """
 
 import asyncio
-import json
+import functools
+import ipaddress
+import socket
 import struct
-import base64
-from typing import Optional, Dict, Any, Callable
+import aiofiles
+from typing import BinaryIO, Callable, Optional, AsyncIterator, List, Sequence
 from .encryption import EncryptionManager
+from .messages import Message, FileTransferStart, FileTransferEnd, encode, decode
+from .compression import FLAG_NONE, Frame, compress_frame, decompress_frame
+from ..config import config
+
+# Message header: body length and number of frames (the msgpack envelope counts
+# as the first frame), followed in the body by a '!BI' flags/length entry per frame
+_HEADER = struct.Struct('!II')
+_FRAME_ENTRY_SIZE = 5
+
+# Most frames a message may carry (envelope, function, arguments and buffers)
+MAX_FRAMES = 65536
+
+# Frame flag marking an unencrypted frame; the low bit is the compression flag
+_FLAG_PLAINTEXT = 2
+
+# Length prefix of each encrypted file chunk, shared with FileTransfer
+CHUNK_LENGTH = struct.Struct('!I')
+
+# Received file data is written to disk in batches of this size
+_FILE_WRITE_BATCH = 4 * 1024 * 1024
+
+# Bytes requested from the stream per read when filling the receive buffer
+_READ_SIZE = 256 * 1024
+
+# StreamReader limit for pycluster connections; the transport stops reading
+# from the socket once twice this much is buffered
+STREAM_LIMIT = 4 * 1024 * 1024
+
+# Kernel socket buffer size, and the transport buffer marks between which
+# drain() suspends, sized so bulk sends only wait on real backpressure
+_SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+WRITE_HIGH_WATER = 4 * 1024 * 1024
+_WRITE_LOW_WATER = 1024 * 1024
+
+@functools.lru_cache(maxsize=64)
+def _frame_table(frame_count: int) -> struct.Struct:
+    """Compiled struct for the frame table of a message with frame_count frames"""
+    return struct.Struct('!' + 'BI' * frame_count)
 
 class SocketManager:
     """Manages encrypted async socket communication"""
     
-    def __init__(self, encryption_manager: EncryptionManager):
-        """Initialize socket manager with encryption"""
+    __slots__ = (
+        "_encryption_manager", "_encrypt", "_decrypt", "reader", "writer", "_buffer", "_start", "compress",
+        "plaintext_files", "allow_loopback_plaintext", "plaintext"
+    )
+    
+    def __init__(self, encryption_manager: EncryptionManager, allow_loopback_plaintext: bool = False):
+        """Initialize socket manager with encryption
+        
+        With allow_loopback_plaintext, messages may skip encryption when the
+        peer is on the loopback interface and agrees to it as well.
+        """
         self.encryption_manager = encryption_manager
+        self.allow_loopback_plaintext = allow_loopback_plaintext
         self.reader: Optional[asyncio.StreamReader] = None
         self.writer: Optional[asyncio.StreamWriter] = None
+        # Received bytes; data before _start has been consumed and is only
+        # dropped on the next read, so parsing a burst of messages never
+        # shifts the rest of the buffer
+        self._buffer = bytearray()
+        self._start = 0
+        # Set once both peers have agreed to LZ4-compress large frames
+        self.compress = False
+        # Send and accept file contents unencrypted, for trusted networks only
+        self.plaintext_files = False
+        # Set once both peers of a loopback connection have agreed to skip
+        # message encryption; plaintext frames are refused otherwise
+        self.plaintext = False
+    
+    @property
+    def encryption_manager(self) -> EncryptionManager:
+        """Encryption manager used for this connection"""
+        return self._encryption_manager
+    
+    @encryption_manager.setter
+    def encryption_manager(self, encryption_manager: EncryptionManager) -> None:
+        # Bound encrypt/decrypt are cached for the per-frame hot paths and
+        # rebound when the session key replaces the shared one
+        self._encryption_manager = encryption_manager
+        self._encrypt = encryption_manager.encrypt
+        self._decrypt = encryption_manager.decrypt
     
     async def connect(self, host: str, port: int) -> None:
         """Connect to a remote host"""
-        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.attach(*await asyncio.open_connection(host, port, limit=STREAM_LIMIT))
     
     async def accept_connection(self, server: asyncio.Server) -> tuple:
         """Accept a connection from a client"""
-        self.reader, self.writer = await server.accept()
+        self.attach(*await server.accept())
         return self.reader, self.writer
     
-    def _encode_message(self, message: Dict[str, Any]) -> str:
-        """Encode message for JSON serialization, handling binary data"""
-        def encode_binary(obj):
-            if isinstance(obj, bytes):
-                return {"__binary__": base64.b64encode(obj).decode('utf-8')}
-            elif isinstance(obj, dict):
-                return {k: encode_binary(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [encode_binary(item) for item in obj]
-            else:
-                return obj
+    def attach(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Use an established stream pair, tuning its socket for latency and throughput"""
+        self.reader = reader
+        self.writer = writer
         
-        encoded_message = encode_binary(message)
-        return json.dumps(encoded_message)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            try:
+                # Small messages (heartbeats, acks) go out without Nagle delay
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _SOCKET_BUFFER_SIZE)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _SOCKET_BUFFER_SIZE)
+            except OSError:
+                pass
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER, low=_WRITE_LOW_WATER)
     
-    def _decode_message(self, data: str) -> Dict[str, Any]:
-        """Decode message from JSON, handling binary data"""
-        def decode_binary(obj):
-            if isinstance(obj, dict):
-                if "__binary__" in obj:
-                    return base64.b64decode(obj["__binary__"].encode('utf-8'))
-                else:
-                    return {k: decode_binary(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [decode_binary(item) for item in obj]
-            else:
-                return obj
+    def can_skip_encryption(self) -> bool:
+        """Whether this side would accept unencrypted messages on this connection"""
+        if not self.allow_loopback_plaintext or not self.writer:
+            return False
         
-        decoded_data = json.loads(data)
-        return decode_binary(decoded_data)
+        peername = self.writer.get_extra_info('peername')
+        if not peername:
+            return False
+        try:
+            return ipaddress.ip_address(peername[0]).is_loopback
+        except ValueError:
+            return False
     
-    async def send_message(self, message: Dict[str, Any]) -> None:
-        """Send an encrypted message"""
+    async def send_message(self, message: Message, frames: Optional[Sequence[Frame]] = None) -> None:
+        """Send an encrypted message, optionally followed by raw binary frames
+        
+        Frames are sent as-is after the msgpack envelope, and the whole
+        message goes out with a single drain().
+        """
         if not self.writer:
             raise ConnectionError("Not connected")
         
-        # Serialize and encrypt message
-        data = self._encode_message(message).encode('utf-8')
-        encrypted_data = self.encryption_manager.encrypt(data)
+        # Serialize, compress and encrypt message and frames
+        encrypt = self._encrypt
+        plaintext = self.plaintext
+        entries: List[int] = []
+        parts: List[Frame] = []
+        for frame in (encode(message), *(frames or ())):
+            flag = FLAG_NONE
+            if self.compress:
+                flag, frame = compress_frame(frame)
+            if plaintext:
+                flag |= _FLAG_PLAINTEXT
+                part = frame
+            else:
+                part = encrypt(frame)
+            entries += (flag, len(part))
+            parts.append(part)
+        
+        if len(parts) > MAX_FRAMES:
+            raise ValueError(f"Message has {len(parts)} frames, more than the {MAX_FRAMES} allowed")
         
-        # Send length prefix and data
-        length = struct.pack('!I', len(encrypted_data))
-        self.writer.write(length + encrypted_data)
+        # Send header, frame table and frames in one write
+        table = _frame_table(len(parts)).pack(*entries)
+        header = _HEADER.pack(len(table) + sum(entries[1::2]), len(parts))
+        self.writer.writelines([header, table, *parts])
         await self.writer.drain()
     
-    async def receive_message(self) -> Dict[str, Any]:
-        """Receive and decrypt a message"""
+    async def receive_message(self) -> Message:
+        """Receive and decrypt a message
+        
+        Raw binary frames sent alongside the message are attached to its
+        ``frames`` field.
+        """
         if not self.reader:
             raise ConnectionError("Not connected")
         
-        # Read length prefix
-        length_data = await self.reader.readexactly(4)
-        length = struct.unpack('!I', length_data)[0]
+        while True:
+            message = self._parse_message()
+            if message is not None:
+                return message
+            await self._fill_buffer()
+    
+    async def receive_messages_batch(self) -> AsyncIterator[List[Message]]:
+        """Yield lists of messages, one list per read from the socket
         
-        # Read encrypted data
-        encrypted_data = await self.reader.readexactly(length)
+        Every complete message already buffered is parsed before the next
+        read, so a burst of small messages costs a single wakeup.
+        """
+        if not self.reader:
+            raise ConnectionError("Not connected")
         
-        # Decrypt and deserialize
-        data = self.encryption_manager.decrypt(encrypted_data)
-        return self._decode_message(data.decode('utf-8'))
+        while True:
+            messages = []
+            message = self._parse_message()
+            while message is not None:
+                messages.append(message)
+                message = self._parse_message()
+            
+            if messages:
+                yield messages
+            await self._fill_buffer()
+    
+    async def readexactly(self, n: int) -> bytes:
+        """Read exactly n raw bytes, consuming buffered data first"""
+        if not self.reader:
+            raise ConnectionError("Not connected")
+        
+        while len(self._buffer) - self._start < n:
+            await self._fill_buffer()
+        
+        start = self._start
+        self._start = start + n
+        return bytes(self._buffer[start:start + n])
+    
+    async def _fill_buffer(self) -> None:
+        """Append the next chunk of available data to the receive buffer"""
+        reader = self.reader
+        if reader is None:
+            raise ConnectionError("Not connected")
+        
+        data = await reader.read(_READ_SIZE)
+        if not data:
+            raise ConnectionError("Connection closed by peer")
+        if self._start:
+            del self._buffer[:self._start]
+            self._start = 0
+        self._buffer += data
+    
+    def _parse_message(self) -> Optional[Message]:
+        """Pop one complete message off the receive buffer, if there is one"""
+        buffer = self._buffer
+        start = self._start
+        if len(buffer) - start < _HEADER.size:
+            return None
+        
+        # The header comes from a possibly unauthenticated peer, so check it
+        # before trusting frame_count with anything
+        body_length, frame_count = _HEADER.unpack_from(buffer, start)
+        table_size = _FRAME_ENTRY_SIZE * frame_count
+        if not 0 < frame_count <= MAX_FRAMES or table_size > body_length:
+            raise ValueError(f"Malformed message header: {frame_count} frame(s) in {body_length} bytes")
+        
+        offset = start + _HEADER.size
+        end = offset + body_length
+        if len(buffer) < end:
+            return None
+        self._start = end
+        
+        entries = _frame_table(frame_count).unpack_from(buffer, offset)
+        if table_size + sum(entries[1::2]) != body_length:
+            raise ValueError("Malformed message: frame lengths do not match the body length")
+        
+        # Slice the body into frames straight from the buffer, then decrypt
+        # and decompress each; frames are copied out only when sent in the clear
+        decrypt = self._decrypt
+        parts: List[Frame] = []
+        offset += table_size
+        with memoryview(buffer) as view:
+            for flag, length in zip(entries[::2], entries[1::2]):
+                with view[offset:offset + length] as part:
+                    if flag & _FLAG_PLAINTEXT:
+                        if not self.plaintext:
+                            raise ValueError("Received an unencrypted frame on an encrypted connection")
+                        data = part.tobytes() if flag == _FLAG_PLAINTEXT else part
+                    else:
+                        data = decrypt(part)
+                    parts.append(decompress_frame(flag, data))
+                offset += length
+        
+        message = decode(parts[0])
+        if len(parts) > 1:
+            if not hasattr(message, "frames"):
+                raise ValueError(f"Unexpected frames in {type(message).__name__} message")
+            message.frames = parts[1:]
+        return message
     
     async def send_file(self, file_path: str, chunk_size: int = 8192) -> None:
         """Send a file in chunks"""
@@ -97,54 +284,125 @@ class SocketManager:
         file_size = os.path.getsize(file_path)
         
         # Send file info
-        await self.send_message({
-            "type": "file_transfer_start",
-            "filename": os.path.basename(file_path),
-            "size": file_size
-        })
+        plaintext = self.plaintext_files
+        await self.send_message(FileTransferStart(
+            filename=os.path.basename(file_path),
+            size=file_size,
+            plaintext=plaintext
+        ))
         
         # Send file in chunks
         with open(file_path, 'rb') as f:
-            while True:
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                
-                encrypted_chunk = self.encryption_manager.encrypt(chunk)
-                length = struct.pack('!I', len(encrypted_chunk))
-                self.writer.write(length + encrypted_chunk)
-                await self.writer.drain()
+            if plaintext:
+                await self.sendfile(f, 0, file_size)
+            else:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    
+                    encrypted_chunk = self._encrypt(chunk)
+                    self.writer.writelines((CHUNK_LENGTH.pack(len(encrypted_chunk)), encrypted_chunk))
+                    await self.writer.drain()
         
         # Send end marker
-        await self.send_message({"type": "file_transfer_end"})
+        await self.send_message(FileTransferEnd())
     
-    async def receive_file(self, save_path: str, chunk_size: int = 8192) -> None:
-        """Receive a file in chunks"""
+    async def receive_file(
+        self,
+        save_path: str,
+        chunk_size: int = 8192,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> None:
+        """Receive a file in chunks
+        
+        Reading stops at the announced size, which may not exceed
+        MAX_FILE_SIZE, and fails if the peer stalls for longer than
+        CONNECTION_TIMEOUT.
+        """
         if not self.reader:
             raise ConnectionError("Not connected")
         
         # Receive file info
         file_info = await self.receive_message()
-        if file_info["type"] != "file_transfer_start":
+        if not isinstance(file_info, FileTransferStart):
             raise ValueError("Expected file transfer start message")
+        self.check_plaintext(file_info)
+        
+        file_size = file_info.size
+        if file_size > config.MAX_FILE_SIZE:
+            raise ValueError(f"File of {file_size} bytes exceeds the {config.MAX_FILE_SIZE} byte limit")
         
-        # Receive file in chunks
-        with open(save_path, 'wb') as f:
-            while True:
-                # Read chunk length
-                length_data = await self.reader.readexactly(4)
-                length = struct.unpack('!I', length_data)[0]
+        # Receive file in chunks until the announced size has arrived, writing
+        # in large batches off the event loop
+        received_bytes = 0
+        pending = bytearray()
+        async with aiofiles.open(save_path, 'wb') as f:
+            while received_bytes < file_size:
+                if file_info.plaintext:
+                    chunk = await self._read_within_timeout(min(file_size - received_bytes, chunk_size))
+                else:
+                    # Read chunk length, then the encrypted chunk
+                    length_data = await self._read_within_timeout(CHUNK_LENGTH.size)
+                    length, = CHUNK_LENGTH.unpack_from(length_data)
+                    chunk = self._decrypt(await self._read_within_timeout(length))
                 
-                # Read encrypted chunk
-                encrypted_chunk = await self.reader.readexactly(length)
-                chunk = self.encryption_manager.decrypt(encrypted_chunk)
-                f.write(chunk)
+                received_bytes += len(chunk)
+                if received_bytes > file_size:
+                    raise ValueError(f"Received more than the announced {file_size} bytes")
+                
+                pending += chunk
+                if len(pending) >= _FILE_WRITE_BATCH:
+                    await f.write(pending)
+                    pending.clear()
+                
+                if progress_callback:
+                    progress_callback(received_bytes, file_size)
+            
+            if pending:
+                await f.write(pending)
         
         # Receive end marker
         end_msg = await self.receive_message()
-        if end_msg["type"] != "file_transfer_end":
+        if not isinstance(end_msg, FileTransferEnd):
             raise ValueError("Expected file transfer end message")
     
+    async def sendfile(self, file: BinaryIO, offset: int, count: int) -> int:
+        """Write count bytes of a file unencrypted, starting at offset
+        
+        Uses loop.sendfile(), which copies inside the kernel with
+        sendfile(2) where possible; loops without it (uvloop) fall back to
+        plain reads and writes.
+        """
+        writer = self.writer
+        if writer is None:
+            raise ConnectionError("Not connected")
+        
+        try:
+            return await asyncio.get_running_loop().sendfile(writer.transport, file, offset, count)
+        except NotImplementedError:
+            pass
+        
+        file.seek(offset)
+        sent = 0
+        while sent < count:
+            chunk = file.read(min(count - sent, _READ_SIZE))
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+            sent += len(chunk)
+        return sent
+    
+    async def _read_within_timeout(self, n: int) -> bytes:
+        """readexactly() that gives up if the peer stalls for too long"""
+        return await asyncio.wait_for(self.readexactly(n), timeout=config.CONNECTION_TIMEOUT)
+    
+    def check_plaintext(self, file_info: FileTransferStart) -> None:
+        """Refuse an unencrypted file unless plaintext transfers are enabled here"""
+        if file_info.plaintext and not self.plaintext_files:
+            raise ValueError("Peer sent an unencrypted file but plaintext file transfers are disabled")
+    
     def close(self) -> None:
         """Close the connection"""
         if self.writer:
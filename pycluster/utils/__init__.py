@@ -2,6 +2,12 @@
 Utility functions for PyCluster
 """
 
-from .helpers import get_local_ip, format_size, generate_worker_id, generate_otp, is_port_available
+from .helpers import (
+    get_local_ip, get_hostname, clear_network_cache, format_size, generate_worker_id, generate_otp, is_port_available,
+    estimate_size
+)
 
-__all__ = ["get_local_ip", "format_size", "generate_worker_id", "generate_otp", "is_port_available"] 
\ No newline at end of file
+__all__ = [
+    "get_local_ip", "get_hostname", "clear_network_cache", "format_size", "generate_worker_id", "generate_otp",
+    "is_port_available", "estimate_size"
+] 
\ No newline at end of file
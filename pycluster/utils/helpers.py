@@ -2,15 +2,22 @@
 Helper utility functions for PyCluster
 """
 
+import asyncio
+import functools
 import socket
-import uuid
+import secrets
 import os
-import random
-import string
+import sys
 from typing import Optional
+from ..config import config
+from ..network.encryption import EncryptionManager
 
+# Task payloads larger than this are (de)serialized in a thread rather than on the event loop
+OFFLOAD_THRESHOLD = 16 * 1024
+
+@functools.lru_cache(maxsize=1)
 def get_local_ip() -> str:
-    """Get the local IP address"""
+    """Get the local IP address, cached until clear_network_cache()"""
     try:
         # Connect to a remote address to determine local IP
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
@@ -19,29 +26,50 @@ def get_local_ip() -> str:
     except:
         return "127.0.0.1"
 
+@functools.lru_cache(maxsize=1)
+def get_hostname() -> str:
+    """Get this machine's hostname, cached until clear_network_cache()"""
+    return socket.gethostname()
+
+def clear_network_cache() -> None:
+    """Forget the cached hostname and local IP, e.g. after a network change"""
+    get_local_ip.cache_clear()
+    get_hostname.cache_clear()
+
+# Units for format_size, one per power of 1024
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
 def format_size(size_bytes: int) -> str:
     """Format file size in human readable format"""
-    if size_bytes == 0:
+    size_bytes = int(size_bytes)
+    if size_bytes <= 0:
         return "0B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    
-    return f"{size_bytes:.1f}{size_names[i]}"
+    # Each unit covers 10 more bits of magnitude
+    i = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (10 * i)):.1f}{_SIZE_UNITS[i]}"
 
 def generate_worker_id() -> str:
     """Generate a unique worker ID"""
-    hostname = socket.gethostname()
-    unique_suffix = uuid.uuid4().hex[:8]
+    hostname = get_hostname()
+    unique_suffix = secrets.token_hex(4)
     return f"{hostname}-{unique_suffix}"
 
-def generate_otp(length: int = 8) -> str:
-    """Generate a one-time password"""
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(random.choice(characters) for _ in range(length))
+# One-time passwords come from the same secure generator the host uses
+generate_otp = EncryptionManager.generate_otp
+
+def install_uvloop() -> bool:
+    """Use uvloop as the asyncio event loop policy if it is available"""
+    if config.DISABLE_UVLOOP:
+        return False
+    
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
 
 def ensure_directory(path: str) -> None:
     """Ensure a directory exists, create if it doesn't"""
@@ -61,4 +89,14 @@ def find_available_port(start_port: int = 8888, max_attempts: int = 100) -> Opti
     for port in range(start_port, start_port + max_attempts):
         if is_port_available(port):
             return port
-    return None 
\ No newline at end of file
+    return None
+
+def estimate_size(args: tuple, kwargs: dict) -> int:
+    """Cheaply estimate the serialized size of task arguments or results"""
+    size = 0
+    for value in (*args, *kwargs.values()):
+        try:
+            size += memoryview(value).nbytes
+        except TypeError:
+            size += sys.getsizeof(value)
+    return size
@@ -32,7 +32,6 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
         "Programming Language :: Python :: 3.10",
@@ -41,9 +40,19 @@ setup(
         "Topic :: System :: Distributed Computing",
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
-    python_requires=">=3.7",
+    python_requires=">=3.8",
     install_requires=read_requirements(),
     extras_require={
+        "fast": [
+            "uvloop>=0.17.0; platform_system != 'Windows'",
+            "lz4>=4.0.0",
+        ],
+        "jit": [
+            "numba>=0.56.0",
+        ],
+        "redis": [
+            "redis>=4.2.0",
+        ],
         "dev": [
             "pytest>=6.0.0",
             "pytest-asyncio>=0.18.0",
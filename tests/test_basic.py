@@ -61,4 +61,329 @@ async def test_set_host():
     host = Host(port=8888)
     set_host(host)
     # This should not raise an error
-    assert True 
\ No newline at end of file
+    assert True 
+
+@pytest.mark.asyncio
+async def test_connection_pool_reuse():
+    """Test that pooled connections are reused and capped"""
+    from pycluster.core.host import ConnectionPool
+    from pycluster.network import EncryptionManager, SocketManager
+
+    pool = ConnectionPool(max_connections=1)
+    socket_manager = SocketManager(EncryptionManager())
+    assert pool.add("worker-1", socket_manager)
+    assert not pool.add("worker-2", SocketManager(EncryptionManager()))
+
+    async with pool.acquire("worker-1") as acquired:
+        assert acquired is socket_manager
+    async with pool.acquire("worker-1") as acquired:
+        assert acquired is socket_manager
+
+    pool.discard("worker-1", socket_manager)
+    assert not pool.has_connections("worker-1")
+
+
+def test_message_roundtrip():
+    """Test that wire messages survive encoding"""
+    from pycluster.network.messages import ExecuteTask, TaskResult, decode, encode
+
+    message = decode(encode(TaskResult(task_id="t1", success=False, error="boom")))
+    assert isinstance(message, TaskResult)
+    assert message.error == "boom"
+
+    # Frames travel outside the envelope, so they are never encoded into it
+    message = decode(encode(ExecuteTask(task_id="t2")))
+    assert isinstance(message, ExecuteTask)
+    assert message.frames == []
+
+
+def test_prepared_task():
+    """Test that a prepared task serializes its function once"""
+    import cloudpickle
+
+    def add(x, y):
+        return x + y
+
+    host = Host(port=8888)
+    prepared = host.prepare(add)
+    assert prepared.host is host
+    assert cloudpickle.loads(prepared.serialized_func)(1, 2) == 3
+    assert host.prepare(add).serialized_func is prepared.serialized_func
+
+
+def test_argument_serialization():
+    """Test that closures and out-of-band buffers survive as task arguments"""
+    import pickle
+    import cloudpickle
+    from pycluster.core.host import _serialize_arguments
+    from pycluster.core.worker import _deserialize_task
+
+    offset = 10
+    data = bytearray(b"x" * 1024)
+    serialized_arguments, buffers = _serialize_arguments(
+        (lambda x: x + offset, pickle.PickleBuffer(data)), {"scale": 2}
+    )
+    assert len(buffers) == 1
+
+    func, is_coroutine, args, kwargs = _deserialize_task(
+        cloudpickle.dumps(len), serialized_arguments, [bytes(b.raw()) for b in buffers]
+    )
+    assert func is len and not is_coroutine
+    assert args[0](1) == 11
+    assert bytes(args[1]) == bytes(data)
+    assert kwargs == {"scale": 2}
+
+
+def test_session_key_derivation():
+    """Test that both peers derive the same per-connection key"""
+    from pycluster.network import EncryptionManager
+
+    key = EncryptionManager.generate_key()
+    host_side = EncryptionManager(key).derive_session("OTP12345", b"n" * 16, "worker-1")
+    worker_side = EncryptionManager(key).derive_session("OTP12345", b"n" * 16, "worker-1")
+    assert worker_side.decrypt(host_side.encrypt(b"payload")) == b"payload"
+    assert host_side.get_key() != EncryptionManager(key).derive_session("OTP12345", b"m" * 16, "worker-1").get_key()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [None, "sqlite"])
+async def test_remote_cache(tmp_path, backend):
+    """Test that cached remote calls skip dispatch for repeated arguments"""
+    cache_backend = f"sqlite:///{tmp_path / 'cache.db'}" if backend else None
+    host = Host(port=8888)
+    calls = []
+
+    async def fake_execute(task_id, serialized_func, args, kwargs, target_worker=None):
+        calls.append(args)
+        return sum(args)
+
+    host._execute_serialized = fake_execute
+    set_host(host)
+    try:
+        @remote(cache=True, cache_backend=cache_backend)
+        async def add(x, y):
+            return x + y
+
+        assert await add(1, 2) == 3
+        assert await add(1, 2) == 3
+        assert await add(2, 2) == 4
+        assert len(calls) == 2
+
+        add.cache_clear()
+        assert await add(1, 2) == 3
+        assert len(calls) == 3
+    finally:
+        set_host(None)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compress,plaintext", [(False, False), (True, False), (True, True)])
+async def test_socket_manager_roundtrip(compress, plaintext):
+    """Test framed messages with raw frames over a loopback connection"""
+    from pycluster.network import EncryptionManager, SocketManager
+    from pycluster.network.messages import ExecuteTask, Heartbeat
+
+    key = EncryptionManager.generate_key()
+    received = asyncio.get_running_loop().create_future()
+
+    async def handle(reader, writer):
+        receiver = SocketManager(EncryptionManager(key))
+        receiver.attach(reader, writer)
+        receiver.plaintext = plaintext
+        received.set_result([await receiver.receive_message(), await receiver.receive_message()])
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    sender = SocketManager(EncryptionManager(key))
+    await sender.connect("127.0.0.1", port)
+    sender.compress = compress
+    sender.plaintext = plaintext
+
+    frames = [b"f" * 100_000, bytearray(b"\x00\x01"), memoryview(b"xyz")]
+    await sender.send_message(ExecuteTask(task_id="t1"), frames)
+    await sender.send_message(Heartbeat(worker_id="w1"))
+    task, heartbeat = await asyncio.wait_for(received, 5)
+
+    assert task.task_id == "t1"
+    assert [bytes(frame) for frame in task.frames] == [bytes(frame) for frame in frames]
+    assert heartbeat.worker_id == "w1"
+
+    sender.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("plaintext_files", [False, True])
+async def test_file_transfer_roundtrip(tmp_path, plaintext_files):
+    """Test that a received file stops at the announced size and matches the source"""
+    import os
+    from pycluster.network import EncryptionManager, FileTransfer, SocketManager
+
+    source = tmp_path / "source.bin"
+    source.write_bytes(os.urandom(300_000))
+    target = tmp_path / "out" / "target.bin"
+    key = EncryptionManager.generate_key()
+    progress = []
+    done = asyncio.get_running_loop().create_future()
+
+    async def handle(reader, writer):
+        receiver = SocketManager(EncryptionManager(key))
+        receiver.attach(reader, writer)
+        receiver.plaintext_files = plaintext_files
+        try:
+            await FileTransfer(receiver).receive_file_with_progress(
+                str(target), progress_callback=lambda received, total: progress.append(received)
+            )
+            done.set_result(None)
+        except Exception as e:
+            done.set_exception(e)
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    sender = SocketManager(EncryptionManager(key))
+    await sender.connect("127.0.0.1", server.sockets[0].getsockname()[1])
+    sender.plaintext_files = plaintext_files
+    await sender.send_file(str(source), chunk_size=64 * 1024)
+    await asyncio.wait_for(done, 5)
+
+    assert target.read_bytes() == source.read_bytes()
+    assert progress[-1] == 300_000
+
+    sender.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.parametrize("body_length,frame_count", [(0, 0), (4, 1), (9, 2), (5, 1), (2**32 - 1, 2**32 - 1)])
+def test_socket_manager_rejects_malformed_headers(body_length, frame_count):
+    """Test that frame tables inconsistent with the body length are refused"""
+    import struct
+    from pycluster.network import EncryptionManager, SocketManager
+
+    manager = SocketManager(EncryptionManager())
+    # (5, 1) announces a 10-byte frame in a body with no room for it; huge
+    # headers must be refused before their body arrives
+    body = struct.pack("!BI", 0, 10) if frame_count == 1 and body_length == 5 else bytes(min(body_length, 64))
+    manager._buffer += struct.pack("!II", body_length, frame_count) + body + bytes(16)
+    with pytest.raises(ValueError):
+        manager._parse_message()
+
+
+@pytest.mark.asyncio
+async def test_worker_task_slots():
+    """Test that a worker stays dispatchable until its advertised slots are full"""
+    import time
+    from pycluster.core.host import WorkerInfo
+    from pycluster.network.messages import TaskResult
+
+    host = Host(port=8888)
+    host._idle_workers = asyncio.Queue()
+    worker_info = WorkerInfo(id="w1", hostname="h", last_heartbeat=time.time(), capacity=2)
+    host._mark_idle(worker_info)
+
+    assert await host._next_idle_worker() is worker_info
+    worker_info.tasks.add("a")
+    host._mark_idle(worker_info)
+    assert await host._next_idle_worker() is worker_info
+    worker_info.tasks.add("b")
+    host._mark_idle(worker_info)
+    assert host._idle_workers.empty()
+
+    # Finishing one of two overlapping tasks frees exactly one slot
+    host._handle_task_result(worker_info, TaskResult(task_id="a", success=False, error="x"))
+    assert worker_info.tasks == {"b"}
+    assert await host._next_idle_worker() is worker_info
+
+
+@pytest.mark.asyncio
+async def test_connection_pool_frees_dead_workers():
+    """Test that a worker's pool slots are freed once it is no longer active"""
+    from pycluster.core.host import ConnectionPool
+    from pycluster.network import EncryptionManager, SocketManager
+
+    pool = ConnectionPool(max_connections=1)
+    connection = SocketManager(EncryptionManager())
+    assert pool.add("w1", connection)
+    assert not pool.add("w2", SocketManager(EncryptionManager()))
+
+    # The only connection is checked out, so acquiring again times out
+    async with pool.acquire("w1"):
+        with pytest.raises(ConnectionError):
+            async with pool.acquire("w1", timeout=0.01):
+                pass
+
+    assert pool.reap_idle(3600, {"w1"}) == 0
+    assert pool.reap_idle(3600, set()) == 1
+    assert pool.add("w2", SocketManager(EncryptionManager()))
+
+
+def test_memory_cache_fifo():
+    """Test that the in-memory cache evicts the oldest entry first"""
+    from pycluster.cache import MISSING, MemoryCache
+
+    cache = MemoryCache(maxsize=2)
+    cache.set(b"a", 1)
+    cache.set(b"b", 2)
+    assert cache.get(b"a") == 1
+    cache.set(b"c", 3)
+    assert cache.get(b"a") is MISSING
+    assert cache.get(b"b") == 2 and cache.get(b"c") == 3
+
+
+def test_sqlite_cache(tmp_path):
+    """Test the shared SQLite cache backend"""
+    from pycluster.cache import MISSING, create_cache
+
+    path = f"sqlite:///{tmp_path / 'cache.db'}"
+    first = create_cache(path, "mod.first", maxsize=2)
+    second = create_cache(path, "mod.second")
+
+    assert first.get(b"a") is MISSING
+    first.set(b"a", None)
+    assert first.get(b"a") is None
+    assert second.get(b"a") is MISSING
+
+    first.set(b"b", [1, 2])
+    first.set(b"c", {"x": 3})
+    assert first.get(b"a") is MISSING
+    assert create_cache(path, "mod.first").get(b"c") == {"x": 3}
+
+    first.clear()
+    assert first.get(b"b") is MISSING
+
+
+def test_cache_backend_options():
+    """Test that maxsize and ttl are only accepted by backends that honour them"""
+    from pycluster.cache import MemoryCache, create_cache
+
+    assert create_cache(None, "mod.f").maxsize == 1024
+    with pytest.raises(ValueError):
+        create_cache("redis://localhost:6379/0", "mod.f", maxsize=10)
+    with pytest.raises(ValueError):
+        create_cache("memory", "mod.f", ttl=60)
+    with pytest.raises(ValueError):
+        remote(cache_backend="redis://localhost:6379/0", maxsize=10)(lambda: None)
+    assert isinstance(create_cache("memory", "mod.f", maxsize=10), MemoryCache)
+
+
+@pytest.mark.asyncio
+async def test_remote_sync_call():
+    """Test that sync remote calls run on the host loop from other threads"""
+    host = Host(port=8888)
+
+    async def fake_execute(task_id, serialized_func, args, kwargs, target_worker=None):
+        return sum(args)
+
+    host._execute_serialized = fake_execute
+    host._loop = asyncio.get_running_loop()
+    set_host(host)
+    try:
+        @remote()
+        def add(x, y):
+            return x + y
+
+        assert await host._loop.run_in_executor(None, add, 1, 2) == 3
+        with pytest.raises(RuntimeError):
+            add(1, 2)
+    finally:
+        set_host(None)